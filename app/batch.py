@@ -0,0 +1,113 @@
+import asyncio
+import os
+from concurrent.futures import Executor
+from itertools import chain
+from typing import List, Optional, Union
+
+from app.config import settings
+from app.schemas import Coordinates, RadarError, RadarRequest
+from app.services import compile_protocols
+
+RadarResult = Union[Coordinates, RadarError]
+
+_process_pool: Optional[Executor] = None
+_is_pool_worker = False
+
+
+def evaluate_request(request: RadarRequest, vectorized: bool = False) -> RadarResult:
+    """
+    Evaluates a single radar request, turning a "no valid targets" outcome into
+    a RadarError instead of raising.
+
+    Args:
+        request (RadarRequest): The radar request to evaluate.
+        vectorized (bool): Whether to use the NumPy engine.
+
+    Returns:
+        Union[Coordinates, RadarError]: The coordinates of the next target or the error.
+    """
+    try:
+        plan = compile_protocols(request.protocols)
+        return plan.find_next_target(request.scan, vectorized=vectorized).coordinates
+    except ValueError as error:
+        return RadarError(detail=str(error))
+
+
+def evaluate_requests(requests: List[RadarRequest], vectorized: bool = False) -> List[RadarResult]:
+    """Evaluates a list of radar requests in the current process, keeping their order."""
+    return [evaluate_request(request, vectorized=vectorized) for request in requests]
+
+
+def batch_workers() -> int:
+    return settings.batch_workers or os.cpu_count() or 1
+
+
+def init_pool_worker() -> None:
+    """Marks the current process as a pool worker; used as initializer of every process pool."""
+    global _is_pool_worker
+    _is_pool_worker = True
+
+
+def is_pool_worker() -> bool:
+    """Returns whether the current process is a worker of a process pool, which must not start pools of its own."""
+    return _is_pool_worker
+
+
+def get_process_pool() -> Executor:
+    """Returns the process pool shared by all batches, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        # Imported here since multiprocessing is slow to import and most workers never need it.
+        from concurrent.futures import ProcessPoolExecutor
+        _process_pool = ProcessPoolExecutor(max_workers=batch_workers(), initializer=init_pool_worker)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+def split_batch(requests: List[RadarRequest], chunks: int) -> List[List[RadarRequest]]:
+    """Splits a batch into at most `chunks` contiguous, similarly sized chunks."""
+    size, remainder = divmod(len(requests), chunks)
+    result = []
+    start = 0
+    for position in range(chunks):
+        end = start + size + (1 if position < remainder else 0)
+        if end > start:
+            result.append(requests[start:end])
+        start = end
+    return result
+
+
+def is_small_batch(requests: List[RadarRequest]) -> bool:
+    """Returns whether a batch is too small to be worth splitting across the process pool."""
+    return batch_workers() == 1 or len(requests) < settings.batch_parallel_threshold
+
+
+async def evaluate_batch(requests: List[RadarRequest], vectorized: bool = False) -> List[RadarResult]:
+    """
+    Evaluates a batch of radar requests, returning one result per request in the
+    same order. Batches smaller than RADAR_BATCH_PARALLEL_THRESHOLD are evaluated
+    inline; larger ones are split across the process pool.
+
+    Args:
+        requests (List[RadarRequest]): The radar requests to evaluate.
+        vectorized (bool): Whether to use the NumPy engine.
+
+    Returns:
+        List[Union[Coordinates, RadarError]]: The result of every request.
+    """
+    if is_small_batch(requests):
+        return evaluate_requests(requests, vectorized=vectorized)
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    chunk_results = await asyncio.gather(*(
+        loop.run_in_executor(pool, evaluate_requests, chunk, vectorized)
+        for chunk in split_batch(requests, batch_workers())
+    ))
+    return list(chain.from_iterable(chunk_results))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from app import metrics
+from app.config import settings
+from app.schemas import Coordinates, ScanData
+from app.services import ProtocolPlan
+
+NO_TARGET = b'null'
+
+
+class CacheBackend:
+    """
+    Storage used by ResultCache. Keys are hex digests and values small byte
+    strings, so implementations can be shared between workers (e.g. a Redis or
+    memcached client) as long as they implement get and set.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Returns backend specific counters, such as evictions."""
+        return {}
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """LRU backend bounded in entries, whose entries expire ttl seconds after being set."""
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'evictions': self.evictions, 'expirations': self.expirations}
+
+
+def request_key(plan: ProtocolPlan, targets: List[ScanData]) -> str:
+    """
+    Returns the content address of a radar request: a digest of the normalized
+    protocols and of the scan values, in scan order. JSON key order and protocol
+    reorderings that do not change the result map to the same key.
+    """
+    digest = hashlib.blake2b(','.join(plan.protocols).encode(), digest_size=16)
+    points = [(t.coordinates.x, t.coordinates.y, t.enemies.type, t.enemies.number, t.allies) for t in targets]
+    try:
+        digest.update(orjson.dumps(points))
+    except orjson.JSONEncodeError:
+        # orjson only encodes 64-bit integers.
+        digest.update(json.dumps(points, separators=(',', ':')).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    ResultCache memoizes find_next_target, which is a pure function of the
+    protocols and the scan, storing the coordinates or the no-target outcome.
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def find_next_coordinates(self, plan: ProtocolPlan, targets: List[ScanData], vectorized: bool = False):
+        """
+        Returns the coordinates of the next target, from the cache when the same
+        request was resolved before.
+
+        Raises:
+            ValueError: If no target passes the filters, whether cached or not.
+        """
+        key = request_key(plan, targets)
+        cached = self.backend.get(key)
+        metrics.mark('cache')
+
+        if cached is not None:
+            self.hits += 1
+            if cached == NO_TARGET:
+                metrics.no_target_total.inc((','.join(plan.protocols),))
+                raise ValueError('No valid targets found')
+            x, y = orjson.loads(cached)
+            return Coordinates.construct(x=x, y=y)
+
+        self.misses += 1
+        try:
+            coordinates = plan.find_next_target(targets, vectorized=vectorized).coordinates
+        except ValueError:
+            self.backend.set(key, NO_TARGET)
+            raise
+        self.backend.set(key, orjson.dumps([coordinates.x, coordinates.y]))
+        return coordinates
+
+    def render_metrics(self) -> List[str]:
+        lines = [
+            '# HELP radar_result_cache_hits_total Radar requests answered from the result cache.',
+            '# TYPE radar_result_cache_hits_total counter',
+            f'radar_result_cache_hits_total {self.hits}',
+            '# HELP radar_result_cache_misses_total Radar requests evaluated on a result cache miss.',
+            '# TYPE radar_result_cache_misses_total counter',
+            f'radar_result_cache_misses_total {self.misses}',
+        ]
+        for name, value in sorted(self.backend.stats().items()):
+            metric_type = 'gauge' if name == 'entries' else 'counter'
+            metric_name = f'radar_result_cache_{name}' + ('_total' if metric_type == 'counter' else '')
+            lines += [f'# TYPE {metric_name} {metric_type}', f'{metric_name} {value}']
+        return lines
+
+
+result_cache = ResultCache(
+    InMemoryCacheBackend(max_entries=settings.result_cache_max_entries, ttl=settings.result_cache_ttl)
+)
+metrics.registry.add_collector(result_cache.render_metrics)
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.schemas import ScanData
+from app.services import CostModel, ProtocolPlan, build_plan, engine_dispatcher
+from app.synthetic import generate_scan
+
+logger = logging.getLogger(__name__)
+
+# Mixes with independent filter and sort counts, so every coefficient of the cost model can be fitted.
+CALIBRATION_PROTOCOLS: List[Tuple[str, ...]] = [
+    (),
+    ('avoid-mech', 'closest-enemies'),
+    ('avoid-crossfire', 'assist-allies', 'furthest-enemies'),
+    ('avoid-crossfire', 'prioritize-mech', 'closest-enemies'),
+]
+SEQUENTIAL_SIZES = (16, 256, 2_048)
+PARALLEL_SIZES = (8_192, 32_768)
+
+# Set on shutdown, so a background calibration stops at its next measurement.
+_stopping = threading.Event()
+_calibration_thread: Optional[threading.Thread] = None
+
+
+def _measure(plan: ProtocolPlan, scan: List[ScanData], strategy: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        plan.find_top_targets(scan, 1, strategy=strategy)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _time_strategy(
+    strategy: str, sizes: Sequence[int], scan: List[ScanData], repeat: int, deadline: float, throttle: bool
+) -> Optional[List[Tuple[int, int, int, float]]]:
+    measurements = []
+    for protocols in CALIBRATION_PROTOCOLS:
+        # Private plans keep the synthetic scans out of the filter statistics and metrics.
+        plan = build_plan(protocols, instrumented=False)
+        for size in sizes:
+            if time.perf_counter() > deadline or _stopping.is_set():
+                return None
+            seconds = _measure(plan, scan[:size], strategy, repeat)
+            measurements.append((size, len(plan.filters), len(plan.sorting_methods), seconds))
+            if throttle:
+                # Pausing as long as the measurement took leaves live requests at least half of the GIL.
+                _stopping.wait(seconds * repeat)
+    return measurements
+
+
+def calibrate_engines(
+    sizes: Sequence[int] = SEQUENTIAL_SIZES,
+    parallel_sizes: Optional[Sequence[int]] = PARALLEL_SIZES,
+    repeat: int = 3,
+    budget: Optional[float] = None,
+    throttle: bool = False,
+) -> CostModel:
+    """
+    Times every strategy on synthetic scans of a few sizes and protocol mixes, fits
+    the cost model and installs it in engine_dispatcher.
+
+    Strategies are timed in turn, python first, until the budget runs out; a
+    strategy whose measurements were cut short is left out of the model, so the
+    dispatcher never picks it.
+
+    Args:
+        sizes (Sequence[int]): The scan sizes to time the python and vectorized strategies with.
+        parallel_sizes (Optional[Sequence[int]]): The scan sizes to time the parallel
+            strategy with, which is only calibrated where scans can be sharded.
+        repeat (int): The number of runs per measurement; the fastest one is kept.
+        budget (Optional[float]): The maximum calibration time, in seconds;
+            RADAR_ENGINE_CALIBRATION_BUDGET by default.
+        throttle (bool): Whether to pause after every measurement for as long as it
+            took, so calibrating next to live traffic slows it down at most by half;
+            the pauses count towards the budget.
+
+    Returns:
+        CostModel: The fitted cost model.
+    """
+    deadline = time.perf_counter() + (settings.engine_calibration_budget if budget is None else budget)
+    strategies = {'python': sizes, 'vectorized': sizes}
+    if parallel_sizes and settings.parallel_scan_threshold > 0:
+        # Imported here since starting a pool is only worth it where scans can be sharded.
+        from app import sharding
+        if sharding.can_shard():
+            strategies['parallel'] = parallel_sizes
+
+    largest = max(size for strategy_sizes in strategies.values() for size in strategy_sizes)
+    scan = [ScanData.parse_obj(point) for point in generate_scan(largest)]
+    samples: Dict[str, List[Tuple[int, int, int, float]]] = {}
+    for strategy, strategy_sizes in strategies.items():
+        measurements = _time_strategy(strategy, strategy_sizes, scan, repeat, deadline, throttle)
+        if measurements is None:
+            logger.warning('Engine calibration ran out of time before timing the %s strategy', strategy)
+            break
+        samples[strategy] = measurements
+
+    model = CostModel.fit(samples)
+    engine_dispatcher.model = model
+    logger.info('Calibrated the radar engines: %s', model.coefficients)
+    return model
+
+
+def _calibrate_in_background() -> None:
+    try:
+        calibrate_engines(throttle=True)
+    except Exception:
+        logger.exception('Engine calibration failed, scans keep the uncalibrated strategy')
+
+
+def start_calibration() -> threading.Thread:
+    """
+    Calibrates the engines in a background thread, so workers become ready without
+    waiting for it; until it ends, engine_dispatcher uses its uncalibrated rule.
+
+    The thread shares the GIL with the requests served meanwhile, so it is
+    throttled to hold it at most half of the time, at the cost of fewer
+    measurements within the budget.
+    """
+    global _calibration_thread
+    _stopping.clear()
+    _calibration_thread = threading.Thread(target=_calibrate_in_background, name='radar-calibration', daemon=True)
+    _calibration_thread.start()
+    return _calibration_thread
+
+
+def stop_calibration() -> None:
+    """
+    Stops a background calibration, waits for its thread and resets
+    engine_dispatcher to the uncalibrated rule.
+    """
+    global _calibration_thread
+    if _calibration_thread is None:
+        return
+    _stopping.set()
+    _calibration_thread.join()
+    _calibration_thread = None
+    engine_dispatcher.model = None
@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.packed import decode_packed_scan, is_packed_content_type
+
+# The error recorded for requests without valid targets, which the radar answers with a 500.
+NO_TARGET_ERROR = 'ValueError: No valid targets found'
+
+
+class CaptureLog:
+    """
+    CaptureLog appends captured radar requests to a gzip file, one JSON record per
+    line. Records are buffered and written every flush_records records as a
+    complete gzip member, so a crash loses at most the buffered records and never
+    leaves the file unreadable; gzip readers decode the concatenated members as
+    one stream.
+    """
+
+    def __init__(self, path: str, flush_records: int = 100) -> None:
+        self.path = path
+        self.flush_records = flush_records
+        self._buffer: List[bytes] = []
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """
+        Buffers a record.
+
+        Returns:
+            bool: Whether the buffer is full and should be flushed.
+        """
+        line = orjson.dumps(record) + b'\n'
+        with self._lock:
+            self._buffer.append(line)
+            return len(self._buffer) >= self.flush_records
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            if lines:
+                with open(self.path, 'ab') as log_file:
+                    log_file.write(gzip.compress(b''.join(lines)))
+
+
+def read_capture_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields the records of a capture log, in the order they were captured."""
+    with gzip.open(path, 'rb') as log_file:
+        for line in log_file:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def _decode_request(body: bytes, packed: bool) -> Any:
+    if packed:
+        return orjson.loads(decode_packed_scan(body).to_radar_request().json())
+    return orjson.loads(body)
+
+
+class CaptureMiddleware:
+    """
+    ASGI middleware that records a sample of the requests to the given paths in a
+    CaptureLog, with their protocols and scan, the status and body of the response
+    and the latency. Requests in the packed scan format are recorded as JSON, so
+    a log can be replayed against any engine.
+
+    Only answered requests are captured: 200 responses with their coordinates and
+    500 responses, with a null result and the error. The radar answers 500 when no
+    target is valid, recorded as NO_TARGET_ERROR; any other error is a crash.
+    Bodies that are not a JSON object, such as the list of a batch, are skipped.
+    Bodies are decoded and flushed to disk off the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, log: CaptureLog, paths: Iterable[str], sample_rate: float) -> None:
+        self.app = app
+        self.log = log
+        self.paths = frozenset(paths)
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['path'] not in self.paths or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        chunks: List[bytes] = []
+        response: Dict[str, Any] = {'status': None, 'body': [], 'error': None}
+
+        async def recording_receive() -> Message:
+            message = await receive()
+            if message['type'] == 'http.request':
+                chunks.append(message.get('body', b''))
+            return message
+
+        async def recording_send(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        except Exception as exception:
+            # Raised errors are turned into a 500 response by ServerErrorMiddleware.
+            response['status'] = 500
+            response['error'] = f'{type(exception).__name__}: {exception}'
+            raise
+        finally:
+            status = response['status']
+            if status in (200, 500):
+                latency = time.perf_counter() - start
+                body = b''.join(response['body'])
+                result = orjson.loads(body) if status == 200 else None
+                error = None if status == 200 else response['error'] or body.decode(errors='replace')
+                packed = is_packed_content_type(Headers(scope=scope).get('content-type', ''))
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._record, b''.join(chunks), packed, status, result, error, latency,
+                )
+
+    def _record(
+        self, body: bytes, packed: bool, status: int, result: Optional[Any], error: Optional[str], latency: float
+    ) -> None:
+        try:
+            request = _decode_request(body, packed)
+        except ValueError:
+            return
+        if not isinstance(request, dict):
+            # A valid JSON body that is not a radar request, such as a list or a scalar.
+            return
+        record = {
+            'time': time.time(),
+            'format': 'packed' if packed else 'json',
+            'protocols': request.get('protocols'),
+            'scan': request.get('scan'),
+            'status': status,
+            'result': result,
+            'error': error,
+            'latency': latency,
+        }
+        if self.log.append(record):
+            self.log.flush()
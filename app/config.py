@@ -0,0 +1,47 @@
+from typing import Literal, Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Settings model to configure the radar service through RADAR_* environment variables."""
+    production: bool = False
+    vectorized_engine: bool = False
+    engine_strategy: Optional[Literal['python', 'vectorized', 'parallel']] = None
+    engine_calibration: bool = True
+    engine_calibration_budget: float = 2.0
+    fast_json: bool = False
+    metrics_enabled: bool = True
+    result_cache_enabled: bool = False
+    result_cache_max_entries: int = 10_000
+    result_cache_ttl: float = 300.0
+    executor: str = 'thread'
+    executor_workers: Optional[int] = None
+    executor_max_queue: int = 64
+    executor_inline_max_scan: int = 1_000
+    executor_retry_after: int = 1
+    max_body_size: int = 64 * 1024 * 1024
+    max_scan_size: int = 1_000_000
+    max_stream_line_size: int = 64 * 1024
+    plan_cache_size: int = 128
+    adaptive_filters: bool = True
+    adaptive_filter_sample_every: int = 16
+    adaptive_filter_reorder_every: int = 64
+    batch_workers: Optional[int] = None
+    batch_parallel_threshold: int = 256
+    parallel_scan_threshold: int = 250_000
+    profile_header: str = 'X-Radar-Profile'
+    profile_sample_rate: float = 0.0
+    profile_max_entries: int = 100
+    capture_path: Optional[str] = None
+    capture_sample_rate: float = 0.01
+    capture_flush_records: int = 100
+    session_max_points: int = 100_000
+    session_max_count: int = 1024
+    session_idle_timeout: float = 300.0
+
+    class Config:
+        env_prefix = 'RADAR_'
+
+
+settings = Settings()
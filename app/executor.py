@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app import metrics
+from app.batch import init_pool_worker
+from app.cache import result_cache
+from app.config import settings
+from app.profiling import is_profiling
+from app.schemas import Coordinates, ScanData
+from app.services import compile_protocols
+from app.sessions import BattlefieldSession
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+def evaluate_radar(protocols: Tuple[str, ...], targets: List[ScanData]) -> Coordinates:
+    """
+    Finds the coordinates of the next target, through the result cache when it
+    is enabled. Takes the protocols rather than a plan so it can run in another process.
+
+    Raises:
+        ValueError: If no target passes the filters.
+    """
+    plan = compile_protocols(protocols)
+    if settings.result_cache_enabled:
+        return result_cache.find_next_coordinates(plan, targets, vectorized=settings.vectorized_engine)
+    return plan.find_next_target(targets, vectorized=settings.vectorized_engine).coordinates
+
+
+def evaluate_top_radar(protocols: Tuple[str, ...], targets: List[ScanData], k: int) -> List[ScanData]:
+    """Finds up to k targets, best first; see evaluate_radar."""
+    return compile_protocols(protocols).find_top_targets(targets, k, vectorized=settings.vectorized_engine)
+
+
+def evaluate_session_radar(protocols: Tuple[str, ...], session: BattlefieldSession) -> Coordinates:
+    """Finds the coordinates of the next target among the points of a session; see evaluate_radar."""
+    return session.find_next_target(compile_protocols(protocols)).coordinates
+
+
+class RadarExecutor:
+    """
+    RadarExecutor runs CPU-bound radar work off the event loop, in a thread or
+    process pool, so one large scan does not block every other request.
+
+    Work on scans of at most inline_max_scan points runs inline, since dispatching
+    it would cost more than running it. At most max_workers + max_queue jobs are
+    admitted at once; beyond that ExecutorBusyError is raised so the caller can
+    shed load instead of letting latency grow without limit.
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int, inline_max_scan: int) -> None:
+        if kind not in ('thread', 'process', 'inline'):
+            raise ValueError(f'Unknown executor kind: {kind}')
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.inline_max_scan = inline_max_scan
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_pool_worker)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='radar')
+        return self._executor
+
+    async def run(self, scan_size: int, func: Callable, *args: Any) -> Any:
+        """
+        Runs func(*args), inline or in the pool depending on the scan size.
+
+        Raises:
+            ExecutorBusyError: If the pool and its queue are full.
+        """
+        # Profiled requests run inline, since cProfile only sees the event loop thread.
+        if self.kind == 'inline' or scan_size <= self.inline_max_scan or is_profiling():
+            return func(*args)
+        if self.pending >= self.max_workers + self.max_queue:
+            metrics.executor_rejected_total.inc()
+            raise ExecutorBusyError()
+
+        loop = asyncio.get_running_loop()
+        if self.kind == 'thread':
+            # Threads keep the request context, so stage timings are still recorded.
+            call = functools.partial(contextvars.copy_context().run, func, *args)
+        else:
+            call = functools.partial(func, *args)
+
+        # pending is only updated from the event loop thread, so it needs no lock.
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+radar_executor = RadarExecutor(
+    kind=settings.executor,
+    max_workers=settings.executor_workers or os.cpu_count() or 1,
+    max_queue=settings.executor_max_queue,
+    inline_max_scan=settings.executor_inline_max_scan,
+)
+
+
+async def run_radar(scan_size: int, func: Callable, *args: Any) -> Any:
+    """
+    Runs radar work in radar_executor, answering 503 with a Retry-After header
+    when its queue is full.
+    """
+    try:
+        return await radar_executor.run(scan_size, func, *args)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503,
+            detail='Radar is overloaded, retry later',
+            headers={'Retry-After': str(settings.executor_retry_after)},
+        )
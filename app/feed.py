@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import orjson
+from fastapi import WebSocket, status
+from pydantic import ValidationError, parse_obj_as
+
+from app.config import settings
+from app.executor import ExecutorBusyError, evaluate_radar, radar_executor
+from app.fastjson import decode_scan
+from app.schemas import RadarStreamHeader, ScanData
+from app.services import ProtocolPlan, compile_protocols
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]
+
+
+def _find_next_coordinates(plan: ProtocolPlan, targets: List[ScanData]) -> Any:
+    return plan.find_next_target(targets, vectorized=settings.vectorized_engine).coordinates
+
+
+def _frame_of(message: Dict[str, Any]) -> Frame:
+    text = message.get('text')
+    return text if text is not None else message.get('bytes') or b''
+
+
+def _error(seq: Optional[int], detail: Any) -> Dict[str, Any]:
+    return {'type': 'error', 'seq': seq, 'detail': detail}
+
+
+class FeedConnection:
+    """
+    FeedConnection serves the scan frames of one radar feed with the plan the
+    client subscribed with.
+
+    Frames are read by a receiver task into a single slot, so a frame that is
+    still waiting when a newer one arrives is dropped instead of queued: the
+    evaluator always works on the newest frame, and reports how many frames were
+    dropped since its previous answer.
+    """
+
+    def __init__(self, websocket: WebSocket, plan: ProtocolPlan) -> None:
+        self.websocket = websocket
+        self.plan = plan
+        self.dropped = 0
+        self.closed = False
+        self._frame: Optional[Frame] = None
+        self._frame_ready = asyncio.Event()
+
+    async def receive_frames(self) -> None:
+        while True:
+            message = await self.websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                self.closed = True
+                self._frame_ready.set()
+                return
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = _frame_of(message)
+            self._frame_ready.set()
+
+    async def evaluate_frames(self) -> None:
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            if self.closed:
+                return
+            frame, self._frame = self._frame, None
+            if frame is None:
+                continue
+            dropped, self.dropped = self.dropped, 0
+            reply = await self.evaluate(frame)
+            await self.websocket.send_text(orjson.dumps({**reply, 'dropped': dropped}).decode())
+
+    async def evaluate(self, frame: Frame) -> Dict[str, Any]:
+        """
+        Finds the next target of a frame, a JSON object with an integer `seq` and a
+        `scan` list of ScanData.
+
+        Returns:
+            Dict[str, Any]: A target, no_target or error message tagged with the frame seq;
+                evaluation errors are answered with an error message too.
+        """
+        try:
+            data = orjson.loads(frame)
+        except orjson.JSONDecodeError:
+            return _error(None, 'Frames must be JSON objects')
+        seq = data.get('seq') if type(data) is dict else None
+        if type(seq) is not int:
+            return _error(None, 'Frames must have an integer seq')
+
+        scan = decode_scan(data.get('scan'))
+        if scan is None:
+            try:
+                scan = parse_obj_as(List[ScanData], data.get('scan'))
+            except ValidationError as error:
+                return _error(seq, error.errors())
+        if len(scan) > settings.max_scan_size:
+            return _error(seq, f'Scans are limited to {settings.max_scan_size} points')
+
+        # Plans do not pickle, so process pools compile their own from the protocols.
+        if radar_executor.kind == 'process':
+            func, args = evaluate_radar, (self.plan.protocols, scan)
+        else:
+            func, args = _find_next_coordinates, (self.plan, scan)
+        try:
+            coordinates = await radar_executor.run(len(scan), func, *args)
+        except ExecutorBusyError:
+            return _error(seq, 'Radar is overloaded, retry later')
+        except ValueError:
+            return {'type': 'no_target', 'seq': seq}
+        except Exception:
+            # Any other failure only concerns this frame, so the feed stays open for the next ones.
+            logger.exception('Radar feed failed to evaluate frame %s', seq)
+            return _error(seq, 'Radar failed to evaluate the frame')
+        return {'type': 'target', 'seq': seq, 'target': {'x': coordinates.x, 'y': coordinates.y}}
+
+    async def serve(self) -> None:
+        receiver = asyncio.create_task(self.receive_frames())
+        try:
+            await self.evaluate_frames()
+        finally:
+            receiver.cancel()
+
+
+async def serve_feed(websocket: WebSocket) -> None:
+    """
+    Serves a radar feed: the first message holds the RadarStreamHeader with the
+    protocols, compiled once for the whole connection, and every following
+    message is a scan frame answered by FeedConnection.
+    """
+    await websocket.accept()
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        return
+    try:
+        header = RadarStreamHeader.parse_raw(_frame_of(message))
+    except ValidationError as error:
+        await websocket.send_text(orjson.dumps(_error(None, error.errors())).decode())
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    plan = compile_protocols(header.protocols)
+    await websocket.send_text(orjson.dumps({'type': 'subscribed', 'protocols': list(plan.protocols)}).decode())
+    await FeedConnection(websocket, plan).serve()
@@ -0,0 +1,96 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that answers 413 to requests whose body is larger than
+    max_body_size bytes, from the Content-Length header when present or as soon
+    as the received chunks exceed it, before the body is parsed. Without
+    max_body_size, RADAR_MAX_BODY_SIZE is read on every request.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: Optional[int] = None, exclude_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self._max_body_size = max_body_size
+        self.exclude_paths = frozenset(exclude_paths)
+
+    @property
+    def max_body_size(self) -> int:
+        return self._max_body_size if self._max_body_size is not None else settings.max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self.max_body_size
+        content_length = dict(scope['headers']).get(b'content-length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body_size:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_body_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal response_started
+            response_started = response_started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse({'detail': 'Request body too large'}, status_code=413)
+        await response(scope, receive, send)
+
+
+def check_scan_size(scan_size: int) -> None:
+    """
+    Raises:
+        HTTPException: 413 if the scan has more points than RADAR_MAX_SCAN_SIZE.
+    """
+    if scan_size > settings.max_scan_size:
+        raise HTTPException(status_code=413, detail=f'Scans are limited to {settings.max_scan_size} points')
+
+
+async def limit_scan_size(request: Request) -> None:
+    """
+    Dependency that rejects scans with too many points. FastAPI solves it before
+    validating the body, so oversized scans never reach pydantic; the parsed JSON
+    is cached by the request and reused for validation.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return  # Reported as a validation error by FastAPI.
+
+    radar_requests = body if isinstance(body, list) else [body]
+    scan_size = sum(
+        len(radar_request['scan']) for radar_request in radar_requests
+        if isinstance(radar_request, dict) and isinstance(radar_request.get('scan'), list)
+    )
+    check_scan_size(scan_size)
@@ -1,24 +1,125 @@
-from fastapi import FastAPI
+from typing import Any, Dict, List, Union
 
-from app.schemas import Coordinates, RadarRequest
-from app.services import RadarSystem
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.batch import (
+    evaluate_batch,
+    evaluate_requests,
+    is_small_batch,
+    shutdown_process_pool,
+)
+from app.calibration import start_calibration, stop_calibration
+from app.capture import CaptureLog, CaptureMiddleware
+from app.config import settings
+from app.executor import (
+    evaluate_radar,
+    evaluate_session_radar,
+    evaluate_top_radar,
+    radar_executor,
+    run_radar,
+)
+from app.feed import serve_feed
+from app.limits import BodySizeLimitMiddleware, limit_scan_size
+from app.metrics import registry
+from app.packed import PACKED_SCAN_MEDIA_TYPE, PackedFastRadarRoute, PackedRadarRoute
+from app.profiling import ProfileStore, ProfilingMiddleware
+from app.schemas import (
+    Coordinates,
+    RadarError,
+    RadarRequest,
+    Readiness,
+    SessionDelta,
+    SessionInfo,
+    SessionRadarRequest,
+)
+from app.services import engine_dispatcher, filter_statistics
+from app.sessions import (
+    BattlefieldSession,
+    SessionDeltaError,
+    SessionNotFoundError,
+    SessionStore,
+)
+from app.streaming import track_stream
+from app.warmup import prebuild_plans, warm_up
 
-app = FastAPI()
+# Production workers skip the docs, whose OpenAPI schema is slow to build on first
+# access, and compile every protocol plan up front.
+app = FastAPI(**({'docs_url': None, 'redoc_url': None, 'openapi_url': None} if settings.production else {}))
+app.state.ready = False
+if settings.production:
+    prebuild_plans()
+profiles = ProfileStore(max_entries=settings.profile_max_entries)
+app.add_middleware(
+    ProfilingMiddleware, store=profiles, paths=['/radar'], header=settings.profile_header,
+    sample_rate=settings.profile_sample_rate,
+)
+capture_log = CaptureLog(settings.capture_path, settings.capture_flush_records) if settings.capture_path else None
+if capture_log is not None:
+    app.add_middleware(
+        CaptureMiddleware, log=capture_log, paths=['/radar'], sample_rate=settings.capture_sample_rate,
+    )
+# Streamed scans are read incrementally, so their size is not limited.
+app.add_middleware(BodySizeLimitMiddleware, exclude_paths=['/radar/stream'])
+sessions = SessionStore(
+    max_sessions=settings.session_max_count,
+    max_points=settings.session_max_points,
+    idle_timeout=settings.session_idle_timeout,
+)
 
 
-@app.post(
+@app.on_event('startup')
+async def startup() -> None:
+    if settings.production:
+        await warm_up(app)
+    app.state.ready = True
+    if settings.engine_calibration:
+        start_calibration()
+
+
+@app.on_event('shutdown')
+def shutdown() -> None:
+    stop_calibration()
+    shutdown_process_pool()
+    radar_executor.shutdown()
+    if capture_log is not None:
+        capture_log.flush()
+
+
+radar_router = APIRouter(route_class=PackedFastRadarRoute if settings.fast_json else PackedRadarRoute)
+
+
+@radar_router.post(
     '/radar',
     response_model=Coordinates,
     summary='Find next target',
-    description='Receives a RadarRequest JSON data and returns the Coordinates of the visible objective to attack.',
+    description='Receives a RadarRequest JSON data, or the same request in the packed scan binary format, and returns '
+                'the Coordinates of the visible objective to attack.',
+    openapi_extra={
+        'requestBody': {
+            'content': {PACKED_SCAN_MEDIA_TYPE: {'schema': {'type': 'string', 'format': 'binary'}}},
+        },
+    },
     tags=['radar'],
     responses={
         200: {
             'description': 'Successful response',
             'content': {'application/json': {'example': {'latitude': 12.34, 'longitude': 56.78}}},
         },
+        413: {'description': 'Request too large'},
         422: {'description': 'Validation error'},
+        503: {'description': 'Radar overloaded'},
     },
+    dependencies=[Depends(limit_scan_size)],
 )
 async def radar(request: RadarRequest) -> Coordinates:
     """Endpoint that receives a RadarRequest JSON data and returns the Coordinates
@@ -30,6 +131,342 @@ async def radar(request: RadarRequest) -> Coordinates:
     Returns:
         Coordinates: The coordinates of the next point to attack.
     """
-    radar_system = RadarSystem(request.protocols)
-    next_target = radar_system.find_next_target(request.scan)
-    return next_target.coordinates
+    return await run_radar(len(request.scan), evaluate_radar, tuple(request.protocols), request.scan)
+
+
+app.include_router(radar_router)
+
+
+@app.post(
+    '/radar/top',
+    response_model=List[Coordinates],
+    summary='Find next targets',
+    description='Receives a RadarRequest JSON data and returns the Coordinates of the k best visible objectives, '
+                'in attack order.',
+    tags=['radar'],
+    responses={
+        200: {
+            'description': 'Successful response',
+            'content': {'application/json': {'example': [{'x': 0, 'y': 40}, {'x': 0, 'y': 80}]}},
+        },
+        413: {'description': 'Request too large'},
+        422: {'description': 'Validation error'},
+        503: {'description': 'Radar overloaded'},
+    },
+    dependencies=[Depends(limit_scan_size)],
+)
+async def radar_top(
+    request: RadarRequest, k: int = Query(1, ge=1, description='Maximum number of targets to return.')
+) -> List[Coordinates]:
+    """Endpoint that receives a RadarRequest JSON data and returns the Coordinates
+    of the k best visible objectives, so a whole salvo can be planned with one call.
+
+    Args:
+        request (RadarRequest): The radar request sent to the endpoint.
+        k (int): The maximum number of targets to return.
+
+    Returns:
+        List[Coordinates]: The coordinates of up to k targets, best first.
+    """
+    next_targets = await run_radar(len(request.scan), evaluate_top_radar, tuple(request.protocols), request.scan, k)
+    return [target.coordinates for target in next_targets]
+
+
+@app.post(
+    '/radar/batch',
+    response_model=List[Union[Coordinates, RadarError]],
+    summary='Find next target for many requests',
+    description='Receives a list of RadarRequest JSON data and returns, in the same order, the Coordinates of the '
+                'next target of each request or an error when the request has no valid targets.',
+    tags=['radar'],
+    responses={
+        200: {
+            'description': 'Successful response',
+            'content': {
+                'application/json': {'example': [{'x': 0, 'y': 40}, {'detail': 'No valid targets found'}]},
+            },
+        },
+        413: {'description': 'Request too large'},
+        422: {'description': 'Validation error'},
+        503: {'description': 'Radar overloaded'},
+    },
+    dependencies=[Depends(limit_scan_size)],
+)
+async def radar_batch(requests: List[RadarRequest]) -> List[Union[Coordinates, RadarError]]:
+    """Endpoint that receives a list of RadarRequest JSON data and returns the result
+    of every request, so many small requests can share one HTTP round trip.
+
+    Args:
+        requests (List[RadarRequest]): The radar requests sent to the endpoint.
+
+    Returns:
+        List[Union[Coordinates, RadarError]]: The coordinates of the next point to attack,
+            or the error, of every request.
+    """
+    if is_small_batch(requests):
+        # Small batches go through radar_executor like single requests, so they are admitted the same way.
+        scan_size = sum(len(request.scan) for request in requests)
+        return await run_radar(scan_size, evaluate_requests, requests, settings.vectorized_engine)
+    return await evaluate_batch(requests, vectorized=settings.vectorized_engine)
+
+
+@app.post(
+    '/radar/stream',
+    response_model=List[Coordinates],
+    summary='Find next targets from a streamed scan',
+    description='Receives a newline-delimited JSON body whose first line holds the protocols and every following '
+                'line one scanned point, and returns the Coordinates of the k best visible objectives. Points are '
+                'evaluated as they arrive, so the scan is never held in memory.',
+    tags=['radar'],
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/x-ndjson': {
+                    'example': '{"protocols": ["avoid-mech"]}\n'
+                               '{"coordinates": {"x": 0, "y": 40}, "enemies": {"type": "soldier", "number": 10}}\n',
+                },
+            },
+        },
+    },
+    responses={
+        200: {
+            'description': 'Successful response',
+            'content': {'application/json': {'example': [{'x': 0, 'y': 40}]}},
+        },
+        413: {'description': 'Line longer than RADAR_MAX_STREAM_LINE_SIZE or scan larger than RADAR_MAX_SCAN_SIZE'},
+        422: {'description': 'Validation error'},
+    },
+)
+async def radar_stream(
+    request: Request, k: int = Query(1, ge=1, description='Maximum number of targets to return.')
+) -> List[Coordinates]:
+    """Endpoint that receives a streamed radar request and returns the Coordinates
+    of the k best visible objectives, keeping only those k candidates in memory.
+
+    Args:
+        request (Request): The raw request, whose body is read as it arrives.
+        k (int): The maximum number of targets to return.
+
+    Returns:
+        List[Coordinates]: The coordinates of up to k targets, best first.
+    """
+    next_targets = await track_stream(request.stream(), k)
+    return [target.coordinates for target in next_targets]
+
+
+@app.websocket('/radar/feed')
+async def radar_feed(websocket: WebSocket) -> None:
+    """Endpoint that serves a radar feed over a WebSocket. The client sends
+    {"protocols": [...]} once, then scan frames {"seq": n, "scan": [...]}, and gets
+    one target, no_target or error message per evaluated frame, tagged with its
+    seq. Frames that arrive while another one is evaluated are dropped, except
+    the newest.
+
+    Args:
+        websocket (WebSocket): The WebSocket connection.
+    """
+    await serve_feed(websocket)
+
+
+def get_session(session_id: str) -> BattlefieldSession:
+    try:
+        return sessions.get(session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail='Session not found')
+
+
+@app.post(
+    '/sessions',
+    response_model=SessionInfo,
+    status_code=201,
+    summary='Create battlefield session',
+    description='Creates an empty battlefield session whose points are updated with deltas between scans.',
+    tags=['sessions'],
+)
+async def create_session() -> SessionInfo:
+    """Endpoint that creates a new, empty battlefield session.
+
+    Returns:
+        SessionInfo: The id of the new session.
+    """
+    session = sessions.create()
+    return SessionInfo(session_id=session.session_id, points=len(session))
+
+
+@app.patch(
+    '/sessions/{session_id}/scan',
+    response_model=SessionInfo,
+    summary='Update battlefield session',
+    description='Adds, updates and removes scanned points of a battlefield session. The delta is applied entirely '
+                'or not at all.',
+    tags=['sessions'],
+    responses={404: {'description': 'Session not found'}, 422: {'description': 'Validation error'}},
+)
+async def update_session(session_id: str, delta: SessionDelta) -> SessionInfo:
+    """Endpoint that applies the changes of a scan to a battlefield session.
+
+    Args:
+        session_id (str): The id of the session.
+        delta (SessionDelta): The added, updated and removed points.
+
+    Returns:
+        SessionInfo: The session with its new number of points.
+    """
+    session = get_session(session_id)
+    try:
+        session.apply(delta)
+    except SessionDeltaError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    return SessionInfo(session_id=session.session_id, points=len(session))
+
+
+@app.post(
+    '/sessions/{session_id}/radar',
+    response_model=Coordinates,
+    summary='Find next target in battlefield session',
+    description='Returns the Coordinates of the visible objective to attack among the points of a battlefield '
+                'session, as if they were sent as a scan in the order they were added.',
+    tags=['sessions'],
+    responses={
+        404: {'description': 'Session not found or no valid targets'},
+        422: {'description': 'Validation error'},
+        503: {'description': 'Radar overloaded'},
+    },
+)
+async def session_radar(session_id: str, request: SessionRadarRequest) -> Coordinates:
+    """Endpoint that finds the next target among the points of a battlefield session.
+
+    Args:
+        session_id (str): The id of the session.
+        request (SessionRadarRequest): The protocols to apply.
+
+    Returns:
+        Coordinates: The coordinates of the next point to attack.
+    """
+    session = get_session(session_id)
+    try:
+        return await run_radar(len(session), evaluate_session_radar, tuple(request.protocols), session)
+    except ValueError as error:
+        raise HTTPException(status_code=404, detail=str(error))
+
+
+@app.delete(
+    '/sessions/{session_id}',
+    status_code=204,
+    response_class=Response,
+    summary='Delete battlefield session',
+    tags=['sessions'],
+    responses={404: {'description': 'Session not found'}},
+)
+async def delete_session(session_id: str) -> Response:
+    """Endpoint that deletes a battlefield session.
+
+    Args:
+        session_id (str): The id of the session.
+    """
+    try:
+        sessions.delete(session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail='Session not found')
+    return Response(status_code=204)
+
+
+@app.get(
+    '/metrics',
+    response_class=PlainTextResponse,
+    summary='Metrics',
+    description='Returns the radar metrics in the Prometheus text exposition format.',
+    tags=['metrics'],
+)
+async def metrics() -> PlainTextResponse:
+    """Endpoint that exposes the per-stage latency histograms and radar counters
+    in the Prometheus text exposition format.
+
+    Returns:
+        PlainTextResponse: The rendered metrics.
+    """
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.get(
+    '/radar/filters',
+    summary='Filter statistics',
+    description='Returns the order the adaptive filter chain evaluates the filters in, with the cost and rejection '
+                'rate measured for every filter.',
+    tags=['metrics'],
+)
+async def radar_filters() -> Dict[str, Any]:
+    """Endpoint that exposes the filter statistics used to order the filter chain.
+
+    Returns:
+        Dict[str, Any]: The chosen order and the per-filter statistics.
+    """
+    return filter_statistics.snapshot()
+
+
+@app.get(
+    '/radar/engines',
+    summary='Engine strategies',
+    description='Returns the engine strategy forced by configuration, if any, the cost model fitted at startup to '
+                'pick a strategy per request and how many scans each strategy ranked.',
+    tags=['metrics'],
+)
+async def radar_engines() -> Dict[str, Any]:
+    """Endpoint that exposes how the engine dispatcher picks the strategy of each request.
+
+    Returns:
+        Dict[str, Any]: The forced strategy, the cost model, the last strategy and the runs per strategy.
+    """
+    return engine_dispatcher.snapshot()
+
+
+@app.get(
+    '/ready',
+    response_model=Readiness,
+    summary='Readiness',
+    description='Returns whether the worker has finished starting up and warming up, with a 503 status until then.',
+    tags=['health'],
+    responses={503: {'description': 'Worker not ready yet', 'model': Readiness}},
+)
+async def ready() -> JSONResponse:
+    """Endpoint that reports whether the worker is ready to serve radar requests.
+
+    Returns:
+        JSONResponse: The readiness of the worker, with a 503 status when not ready.
+    """
+    is_ready = app.state.ready
+    return JSONResponse(Readiness(ready=is_ready).dict(), status_code=200 if is_ready else 503)
+
+
+@app.get(
+    '/profiles/{request_id}',
+    summary='Request profile',
+    description='Returns the profile of a profiled /radar request, as the most expensive functions by cumulative '
+                'time or, with format=pstats, as a pstats file.',
+    tags=['profiling'],
+    response_class=PlainTextResponse,
+    responses={404: {'description': 'Profile not found'}},
+)
+async def get_profile(
+    request_id: str, format: str = Query('text', regex='^(text|pstats)$', description='text or pstats.')
+) -> Response:
+    """Endpoint that returns the profile stored for a request id.
+
+    Args:
+        request_id (str): The X-Radar-Profile-Id of the profiled request.
+        format (str): 'text' for a readable report, 'pstats' for the raw profile.
+
+    Returns:
+        Response: The profile.
+    """
+    if format == 'pstats':
+        data = profiles.get(request_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail='Profile not found')
+        return Response(data, media_type='application/octet-stream')
+
+    report = profiles.render(request_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return PlainTextResponse(report)
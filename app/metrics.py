@@ -0,0 +1,223 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SCAN_SIZE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with one series per label values tuple."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket bounds and one series per label values tuple. Only
+    the per-bucket counts are updated when observing; they are made cumulative when
+    rendered, as the Prometheus text format expects.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Each series holds the bucket counts, with a last +Inf bucket, then the sum.
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def count(self, labels: Tuple[str, ...]) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                    lines.append(f'{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}')
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+                lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    MetricsRegistry holds the metrics of the worker and renders them in the
+    Prometheus text exposition format. Collectors are callables returning extra
+    lines computed at scrape time, such as the plan cache counters.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """
+    StageTimer splits the time of one request into stages: every call to mark
+    attributes the time elapsed since the previous mark to the given stage.
+    """
+    __slots__ = ('stages', 'protocols', 'scan_size', '_last')
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.protocols: Optional[Tuple[str, ...]] = None
+        self.scan_size: Optional[int] = None
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+def scan_size_bucket(size: Optional[int]) -> str:
+    """Returns the upper bound of the scan size bucket, used as a label to keep cardinality low."""
+    if size is None:
+        return 'unknown'
+    for bound in SCAN_SIZE_BUCKETS:
+        if size <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+registry = MetricsRegistry(enabled=settings.metrics_enabled)
+
+stage_seconds = registry.histogram(
+    'radar_stage_seconds', 'Time spent in each stage of a radar request.', ('stage', 'protocols', 'scan_size'),
+)
+no_target_total = registry.counter(
+    'radar_no_target_total', 'Radar requests without any valid target.', ('protocols',),
+)
+filter_evaluated_total = registry.counter(
+    'radar_filter_evaluated_total', 'Targets evaluated by each filter class.', ('filter',),
+)
+filter_rejected_total = registry.counter(
+    'radar_filter_rejected_total', 'Targets rejected by each filter class.', ('filter',),
+)
+engine_strategy_total = registry.counter(
+    'radar_engine_strategy_total', 'Scans ranked by each engine strategy.', ('strategy',),
+)
+executor_rejected_total = registry.counter(
+    'radar_executor_rejected_total', 'Radar requests rejected because the executor queue was full.',
+)
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar('radar_stage_timer', default=None)
+
+
+def start_timer() -> Optional[StageTimer]:
+    """Starts timing the stages of the current request, if metrics are enabled."""
+    if not registry.enabled:
+        return None
+    timer = StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def mark(stage: str) -> None:
+    """Closes a stage of the current request; does nothing outside a timed request."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark(stage)
+
+
+def describe(protocols: Tuple[str, ...], scan_size: int) -> None:
+    """Sets the labels of the current request once its protocols and scan are known."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.protocols = protocols
+        timer.scan_size = scan_size
+
+
+def discard_timer() -> None:
+    """Stops timing the current request without recording it."""
+    _current_timer.set(None)
+
+
+def finish_timer(timer: StageTimer) -> None:
+    """Records the stages of a timed request in radar_stage_seconds."""
+    _current_timer.set(None)
+    protocols = ','.join(timer.protocols) if timer.protocols is not None else 'unknown'
+    size = scan_size_bucket(timer.scan_size)
+    for stage, seconds in timer.stages.items():
+        stage_seconds.observe((stage, protocols, size), seconds)
@@ -0,0 +1,239 @@
+"""
+Packed binary scan format, accepted by /radar as an alternative to JSON.
+
+A packed scan is a little-endian buffer made of:
+
+    header       magic b'RSCN', uint8 version, uint8 protocol count,
+                 uint16 reserved (0), uint32 point count
+    protocols    one uint8 code per protocol (its position in ProtocolEnum),
+                 zero-padded to a multiple of 4 bytes
+    x, y         int32 per point
+    number       int32 per point, the number of enemies
+    allies       int32 per point, ALLIES_ABSENT when the point has no allies
+    type         uint8 per point, the position of the enemy type in ENEMY_TYPES
+
+The int32 columns are 4-byte aligned, so the server reads every column as a
+NumPy view over the request body, without creating one object per point.
+"""
+import struct
+from typing import Callable, Iterable, List
+
+import numpy as np
+import orjson
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from app import metrics
+from app.executor import run_radar
+from app.fastjson import FastRadarRoute
+from app.limits import check_scan_size
+from app.routing import InstrumentedRoute
+from app.schemas import Coordinates, Enemies, ProtocolEnum, RadarRequest, ScanData
+from app.services import ScanColumns, compile_protocols
+
+PACKED_SCAN_MEDIA_TYPE = 'application/vnd.radar.packed-scan'
+MAGIC = b'RSCN'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHI')
+PROTOCOLS = tuple(protocol.value for protocol in ProtocolEnum)
+ENEMY_TYPES = ('soldier', 'mech')
+ALLIES_ABSENT = int(np.iinfo(np.int32).min)
+INT32 = np.dtype('<i4')
+
+
+class PackedScanError(ValueError):
+    pass
+
+
+def _padded(size: int) -> int:
+    return (size + 3) & ~3
+
+
+class PackedScan:
+    """
+    A decoded packed scan. The columns are read-only views over the buffer the
+    scan was decoded from.
+    """
+    __slots__ = ('protocols', 'x', 'y', 'number', 'allies', 'type')
+
+    def __init__(
+        self, protocols: List[str], x: np.ndarray, y: np.ndarray, number: np.ndarray, allies: np.ndarray,
+        type: np.ndarray,
+    ) -> None:
+        self.protocols = protocols
+        self.x = x
+        self.y = y
+        self.number = number
+        self.allies = allies
+        self.type = type
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def columns(self) -> ScanColumns:
+        has_allies = self.allies != ALLIES_ABSENT
+        return ScanColumns.from_arrays(
+            x=self.x, y=self.y, is_mech=self.type == ENEMY_TYPES.index('mech'), has_allies=has_allies,
+            allies=np.where(has_allies, self.allies, 0),
+        )
+
+    def to_radar_request(self) -> RadarRequest:
+        """Builds the equivalent RadarRequest, one model per point."""
+        return RadarRequest(
+            protocols=self.protocols,
+            scan=[
+                ScanData(
+                    coordinates=Coordinates(x=x, y=y),
+                    enemies=Enemies(type=ENEMY_TYPES[enemy_type], number=number),
+                    allies=None if allies == ALLIES_ABSENT else allies,
+                )
+                for x, y, number, allies, enemy_type in zip(
+                    self.x.tolist(), self.y.tolist(), self.number.tolist(), self.allies.tolist(), self.type.tolist()
+                )
+            ],
+        )
+
+
+def _int32_column(values: Iterable[int], name: str) -> bytes:
+    column = np.fromiter(values, dtype=np.int64)
+    if column.size and (column.min() < ALLIES_ABSENT or column.max() > np.iinfo(np.int32).max):
+        raise PackedScanError(f'{name} does not fit in int32')
+    return column.astype(INT32).tobytes()
+
+
+def encode_packed_scan(protocols: Iterable[str], scan: List[ScanData]) -> bytes:
+    """
+    Encodes a radar request in the packed scan format.
+
+    Args:
+        protocols (Iterable[str]): The protocols of the request.
+        scan (List[ScanData]): The scanned points.
+
+    Raises:
+        PackedScanError: If a protocol or enemy type has no code, or a number does
+            not fit in int32 or collides with ALLIES_ABSENT.
+    """
+    try:
+        protocol_codes = bytes(PROTOCOLS.index(getattr(protocol, 'value', protocol)) for protocol in protocols)
+        types = bytes(ENEMY_TYPES.index(point.enemies.type) for point in scan)
+    except ValueError as error:
+        raise PackedScanError(f'Cannot encode {error}')
+    if len(protocol_codes) > 255:
+        raise PackedScanError('Packed scans hold at most 255 protocols')
+    if any(point.allies == ALLIES_ABSENT for point in scan):
+        raise PackedScanError('allies collides with the absent sentinel')
+
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, len(protocol_codes), 0, len(scan)),
+        protocol_codes.ljust(_padded(len(protocol_codes)), b'\0'),
+        _int32_column((point.coordinates.x for point in scan), 'x'),
+        _int32_column((point.coordinates.y for point in scan), 'y'),
+        _int32_column((point.enemies.number for point in scan), 'number'),
+        _int32_column((ALLIES_ABSENT if point.allies is None else point.allies for point in scan), 'allies'),
+        types,
+    ])
+
+
+def encode_radar_request(request: RadarRequest) -> bytes:
+    return encode_packed_scan(request.protocols, request.scan)
+
+
+def decode_packed_scan(buffer: bytes) -> PackedScan:
+    """
+    Decodes a packed scan without copying its columns.
+
+    Args:
+        buffer (bytes): The packed scan.
+
+    Raises:
+        PackedScanError: If the buffer is not a valid packed scan.
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise PackedScanError('Packed scan is truncated')
+    magic, version, protocol_count, _, count = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise PackedScanError('Not a packed scan or unsupported version')
+
+    offset = HEADER.size + _padded(protocol_count)
+    if len(view) != offset + count * (4 * INT32.itemsize + 1):
+        raise PackedScanError('Packed scan size does not match its point count')
+
+    protocol_codes = view[HEADER.size:HEADER.size + protocol_count]
+    if any(code >= len(PROTOCOLS) for code in protocol_codes):
+        raise PackedScanError('Unknown protocol code')
+
+    columns = []
+    for _ in range(4):
+        columns.append(np.frombuffer(view, dtype=INT32, count=count, offset=offset))
+        offset += count * INT32.itemsize
+    types = np.frombuffer(view, dtype=np.uint8, count=count, offset=offset)
+    if count and types.max() >= len(ENEMY_TYPES):
+        raise PackedScanError('Unknown enemy type code')
+
+    return PackedScan([PROTOCOLS[code] for code in protocol_codes], *columns, types)
+
+
+def evaluate_packed_radar(scan: PackedScan) -> Coordinates:
+    """
+    Finds the coordinates of the next target of a packed scan, evaluating its
+    columns directly.
+
+    Raises:
+        ValueError: If no target passes the filters.
+    """
+    index = compile_protocols(scan.protocols).find_next_index(scan.columns())
+    return Coordinates.construct(x=int(scan.x[index]), y=int(scan.y[index]))
+
+
+def is_packed_content_type(content_type: str) -> bool:
+    return content_type.split(';')[0].strip().lower() == PACKED_SCAN_MEDIA_TYPE
+
+
+def is_packed_request(request: Request) -> bool:
+    return is_packed_content_type(request.headers.get('content-type', ''))
+
+
+class PackedScanRouteMixin:
+    """
+    Route mixin that answers radar requests sent in the packed scan format and
+    hands every other request to the base route class.
+    """
+
+    def get_route_handler(self) -> Callable:
+        default_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if not is_packed_request(request):
+                return await default_handler(request)
+
+            timer = metrics.start_timer()
+            try:
+                body = await request.body()
+                metrics.mark('receive')
+                try:
+                    scan = decode_packed_scan(body)
+                except PackedScanError as error:
+                    metrics.discard_timer()
+                    timer = None
+                    return JSONResponse({'detail': str(error)}, status_code=422)
+                metrics.mark('parse')
+                check_scan_size(len(scan))
+
+                coordinates = await run_radar(len(scan), evaluate_packed_radar, scan)
+                response = Response(content=orjson.dumps(coordinates.dict()), media_type='application/json')
+                metrics.mark('serialize')
+                return response
+            finally:
+                if timer is not None:
+                    metrics.finish_timer(timer)
+
+        return route_handler
+
+
+class PackedRadarRoute(PackedScanRouteMixin, InstrumentedRoute):
+    pass
+
+
+class PackedFastRadarRoute(PackedScanRouteMixin, FastRadarRoute):
+    pass
@@ -0,0 +1,117 @@
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_profiling: ContextVar[bool] = ContextVar('radar_profiling', default=False)
+
+
+def is_profiling() -> bool:
+    """Returns whether the current request is being profiled."""
+    return _profiling.get()
+
+
+class ProfileStore:
+    """
+    ProfileStore keeps the profiles of the last max_entries profiled requests,
+    keyed by request id, as marshalled pstats data.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._profiles: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def add(self, request_id: str, profile: cProfile.Profile) -> None:
+        profile.create_stats()
+        data = marshal.dumps(profile.stats)
+        with self._lock:
+            self._profiles[request_id] = data
+            self._profiles.move_to_end(request_id)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[bytes]:
+        """Returns the profile in the pstats file format, loadable with pstats.Stats or snakeviz."""
+        return self._profiles.get(request_id)
+
+    def render(self, request_id: str, limit: int = 50) -> Optional[str]:
+        """Returns the `limit` most expensive functions of a profile, by cumulative time."""
+        data = self.get(request_id)
+        if data is None:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        stats.stats = marshal.loads(data)
+        stats.get_top_level_stats()
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests to the given paths with cProfile, when
+    they carry the profile header or are picked at sample_rate, and stores the
+    profile under the request id. The id is taken from X-Request-ID or generated,
+    and returned in the X-Radar-Profile-Id response header.
+
+    cProfile traces the event loop thread, so one request is profiled at a time
+    and radar work of profiled requests runs inline instead of in the executor.
+    Other requests served while it awaits are part of the profile too.
+    """
+
+    def __init__(
+        self, app: ASGIApp, store: ProfileStore, paths: Iterable[str], header: str, sample_rate: float
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+        self.header = header
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+
+    def _wants_profile(self, headers: Headers) -> bool:
+        value = headers.get(self.header)
+        if value is not None:
+            return value.lower() not in ('', '0', 'false', 'no')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not self._wants_profile(headers) or not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get('x-request-id') or uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message)['X-Radar-Profile-Id'] = request_id
+            await send(message)
+
+        profile = cProfile.Profile()
+        token = _profiling.set(True)
+        try:
+            profile.enable()
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            _profiling.reset(token)
+            self._lock.release()
+            self.store.add(request_id, profile)
@@ -37,3 +37,41 @@ class RadarRequest(BaseModel):
     """RadarRequest model to represent the information of a radar request."""
     protocols: List[ProtocolEnum]
     scan: List[ScanData]
+
+
+class RadarError(BaseModel):
+    """RadarError model to represent a radar request that could not be resolved."""
+    detail: str
+
+
+class Readiness(BaseModel):
+    """Readiness model to represent whether a worker has finished warming up."""
+    ready: bool
+
+
+class RadarStreamHeader(BaseModel):
+    """RadarStreamHeader model to represent the first line of a streamed radar request."""
+    protocols: List[ProtocolEnum]
+
+
+class SessionPoint(ScanData):
+    """SessionPoint model to represent a scanned point tracked by a battlefield session."""
+    id: str
+
+
+class SessionDelta(BaseModel):
+    """SessionDelta model to represent the changes of a battlefield session between two scans."""
+    add: List[SessionPoint] = []
+    update: List[SessionPoint] = []
+    remove: List[str] = []
+
+
+class SessionInfo(BaseModel):
+    """SessionInfo model to represent the state of a battlefield session."""
+    session_id: str
+    points: int
+
+
+class SessionRadarRequest(BaseModel):
+    """SessionRadarRequest model to represent a radar request over the points of a session."""
+    protocols: List[ProtocolEnum]
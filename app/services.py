@@ -1,19 +1,134 @@
-from math import sqrt
-from typing import List
-
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from math import inf, sqrt
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app import metrics
+from app.config import settings
 from app.schemas import ScanData
 
+logger = logging.getLogger(__name__)
+
+# Columns clip coordinates to this bound, so the sum of their squares fits in an
+# int64. Clipping never changes a result: such points are always out of range.
+COORDINATE_BOUND = 2 ** 31 - 1
+
+
+# Integer columns hold values within +-INT64_MAX, so they can be negated without wrapping.
+INT64_MAX = np.iinfo(np.int64).max
+
+
+class ColumnRangeError(Exception):
+    """Raised when a scan holds values that do not fit in an int64 column; such scans are ranked in Python."""
+
+
+def int64_column(values: Iterable[int], count: int) -> np.ndarray:
+    """
+    Builds an int64 column from values that must be ranked exactly, such as allies.
+
+    Raises:
+        ColumnRangeError: If a value is beyond +-INT64_MAX.
+    """
+    try:
+        column = np.fromiter(values, dtype=np.int64, count=count)
+    except OverflowError:
+        raise ColumnRangeError('Value out of the int64 column range')
+    if count and column.min() < -INT64_MAX:
+        raise ColumnRangeError('Value out of the int64 column range')
+    return column
+
+
+def clipped_coordinates(values: Iterable[int]) -> Iterable[int]:
+    """Clips coordinates of any size to COORDINATE_BOUND, before they are stored in int64 columns."""
+    bound = COORDINATE_BOUND
+    return (value if -bound <= value <= bound else (bound if value > 0 else -bound) for value in values)
+
+
+class ScanColumns:
+    """
+    Column-oriented representation of a scan, used by the vectorized engine.
+
+    Each attribute is a NumPy array with one entry per target, in the original
+    scan order, so filters can be evaluated as boolean masks and sorting
+    methods as key arrays.
+    """
+
+    def __init__(self, targets: List[ScanData]) -> None:
+        count = len(targets)
+        self._set_columns(
+            x=np.fromiter(clipped_coordinates(t.coordinates.x for t in targets), dtype=np.int64, count=count),
+            y=np.fromiter(clipped_coordinates(t.coordinates.y for t in targets), dtype=np.int64, count=count),
+            is_mech=np.fromiter((t.enemies.type == 'mech' for t in targets), dtype=bool, count=count),
+            has_allies=np.fromiter((t.allies is not None for t in targets), dtype=bool, count=count),
+            allies=int64_column((t.allies if t.allies is not None else 0 for t in targets), count),
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, x: np.ndarray, y: np.ndarray, is_mech: np.ndarray, has_allies: np.ndarray, allies: np.ndarray
+    ) -> 'ScanColumns':
+        """
+        Builds the columns of a scan that is already in column form, such as a packed
+        scan, without creating one object per target.
+
+        Args:
+            x (np.ndarray): The x coordinates.
+            y (np.ndarray): The y coordinates.
+            is_mech (np.ndarray): Whether each point holds mechs.
+            has_allies (np.ndarray): Whether each point has allies.
+            allies (np.ndarray): The number of allies, 0 where there are none.
+        """
+        columns = cls.__new__(cls)
+        columns._set_columns(x, y, is_mech, has_allies, allies)
+        return columns
+
+    def _set_columns(
+        self, x: np.ndarray, y: np.ndarray, is_mech: np.ndarray, has_allies: np.ndarray, allies: np.ndarray
+    ) -> None:
+        # Coordinates are widened and clipped so the squared distance cannot overflow.
+        self.x = np.clip(x.astype(np.int64, copy=False), -COORDINATE_BOUND, COORDINATE_BOUND)
+        self.y = np.clip(y.astype(np.int64, copy=False), -COORDINATE_BOUND, COORDINATE_BOUND)
+        self.squared_distance = self.x * self.x + self.y * self.y
+        self.distance = np.sqrt(self.squared_distance)
+        self.is_mech = is_mech.astype(bool, copy=False)
+        self.has_allies = has_allies.astype(bool, copy=False)
+        self.allies = allies.astype(np.int64, copy=False)
+        self.index = np.arange(len(self.x))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
 
 class Filter:
     def is_valid(self, target: ScanData) -> bool:
         raise NotImplementedError
 
+    def mask(self, columns: ScanColumns) -> np.ndarray:
+        """
+        Evaluates the filter over every target at once.
+
+        Args:
+            columns (ScanColumns): The scan in column form.
+
+        Returns:
+            np.ndarray: A boolean array, True for the targets that pass the filter.
+        """
+        raise NotImplementedError
+
 
 class DistanceFilter(Filter):
     def __init__(self, max_distance: float) -> None:
         self.max_distance = max_distance
 
-    def distance(self, target: ScanData) -> float:
+    @staticmethod
+    def distance(target: ScanData) -> float:
         """
         Calculates the Euclidean distance of a target from the origin (0, 0).
 
@@ -25,41 +140,171 @@ class DistanceFilter(Filter):
     def is_valid(self, target: ScanData) -> bool:
         return self.distance(target) <= self.max_distance
 
+    def mask(self, columns: ScanColumns) -> np.ndarray:
+        return columns.distance <= self.max_distance
+
 
 class MechFilter(Filter):
     def is_valid(self, target: ScanData) -> bool:
         return target.enemies.type != 'mech'
 
+    def mask(self, columns: ScanColumns) -> np.ndarray:
+        return ~columns.is_mech
+
 
 class PrioritizeMechFilter(Filter):
     def is_valid(self, target: ScanData) -> bool:
         return target.enemies.type == 'mech'
 
+    def mask(self, columns: ScanColumns) -> np.ndarray:
+        return columns.is_mech
+
 
 class CrossfireFilter(Filter):
     def is_valid(self, target: ScanData) -> bool:
         return target.allies is None
 
+    def mask(self, columns: ScanColumns) -> np.ndarray:
+        return ~columns.has_allies
+
 
 class SortingMethod:
     def sort(self, targets: List[ScanData]) -> List[ScanData]:
         raise NotImplementedError
 
+    def key(self, target: ScanData):
+        """
+        Returns the ascending sort key of a single target, so that a stable sort
+        by this key gives the same order as `sort`.
+
+        Args:
+            target (ScanData): The target to compute the key for.
+        """
+        raise NotImplementedError
+
+    def sort_key(self, columns: ScanColumns) -> np.ndarray:
+        """
+        Returns an ascending sort key equivalent to the order produced by `sort`.
+
+        Args:
+            columns (ScanColumns): The scan in column form.
+
+        Returns:
+            np.ndarray: One key per target; lower keys come first.
+        """
+        raise NotImplementedError
+
 
 class AlliesSort(SortingMethod):
     def sort(self, targets: List[ScanData]) -> List[ScanData]:
         return sorted(targets, key=lambda t: t.allies if t.allies is not None else 0, reverse=True)
 
+    def key(self, target: ScanData) -> int:
+        return -(target.allies if target.allies is not None else 0)
+
+    def sort_key(self, columns: ScanColumns) -> np.ndarray:
+        # int64_column keeps allies within +-INT64_MAX, so the negation cannot wrap.
+        return np.negative(columns.allies)
+
 
 class ClosestEnemiesSort(SortingMethod):
     def sort(self, targets: List[ScanData]) -> List[ScanData]:
         return sorted(targets, key=DistanceFilter(0).distance)
 
+    def key(self, target: ScanData) -> float:
+        return DistanceFilter.distance(target)
+
+    def sort_key(self, columns: ScanColumns) -> np.ndarray:
+        return columns.distance
+
 
 class FurthestEnemiesSort(SortingMethod):
     def sort(self, targets: List[ScanData]) -> List[ScanData]:
         return sorted(targets, key=DistanceFilter(0).distance, reverse=True)
 
+    def key(self, target: ScanData) -> float:
+        return -DistanceFilter.distance(target)
+
+    def sort_key(self, columns: ScanColumns) -> np.ndarray:
+        return -columns.distance
+
+
+PROTOCOL_CLASSES = {
+    'avoid-mech': MechFilter,
+    'prioritize-mech': PrioritizeMechFilter,
+    'avoid-crossfire': CrossfireFilter,
+    'assist-allies': AlliesSort,
+    'closest-enemies': ClosestEnemiesSort,
+    'furthest-enemies': FurthestEnemiesSort,
+}
+
+
+def _rank_targets_vectorized(
+    targets: List[ScanData],
+    filters: Iterable[Filter],
+    sorting_methods: Iterable[SortingMethod],
+    instrumented: bool = True,
+) -> np.ndarray:
+    return _rank_columns(ScanColumns(targets), filters, sorting_methods, instrumented)
+
+
+def _rank_columns(
+    columns: ScanColumns,
+    filters: Iterable[Filter],
+    sorting_methods: Iterable[SortingMethod],
+    instrumented: bool = True,
+) -> np.ndarray:
+    mask = np.ones(len(columns), dtype=bool)
+    for f in filters:
+        if instrumented and metrics.registry.enabled:
+            evaluated = int(np.count_nonzero(mask))
+            mask &= f.mask(columns)
+            _count_filter(f, evaluated, evaluated - int(np.count_nonzero(mask)))
+        else:
+            mask &= f.mask(columns)
+    candidates = np.flatnonzero(mask)
+    metrics.mark('filter')
+
+    if not candidates.size or not sorting_methods:
+        return candidates
+
+    # np.lexsort is stable and uses the last key as the primary one, which
+    # matches applying each sorting method in turn with sorted().
+    keys = [sorting_method.sort_key(columns)[candidates] for sorting_method in sorting_methods]
+    ranking = candidates[np.lexsort(keys)]
+    metrics.mark('sort')
+    return ranking
+
+
+def _find_next_target_vectorized(
+    targets: List[ScanData], filters: Iterable[Filter], sorting_methods: Iterable[SortingMethod]
+) -> ScanData:
+    ranking = _rank_targets_vectorized(targets, filters, sorting_methods)
+
+    if not ranking.size:
+        raise ValueError('No valid targets found')
+
+    return targets[ranking[0]]
+
+
+def _count_filter(f: Filter, evaluated: int, rejected: int) -> None:
+    labels = (type(f).__name__,)
+    metrics.filter_evaluated_total.inc(labels, evaluated)
+    metrics.filter_rejected_total.inc(labels, rejected)
+
+
+def _select_targets(
+    candidates: Iterable[ScanData], sort_key: Optional[Callable[[ScanData], tuple]], k: int
+) -> List[ScanData]:
+    # Both min() and heapq.nsmallest() return the first of several equal keys,
+    # so ties resolve in scan order exactly like the stable sorts do.
+    if k == 1:
+        best = min(candidates, key=sort_key, default=None) if sort_key else next(iter(candidates), None)
+        return [best] if best is not None else []
+    if sort_key is None:
+        return list(itertools.islice(candidates, k))
+    return heapq.nsmallest(k, candidates, key=sort_key)
+
 
 class RadarSystem:
     """
@@ -68,7 +313,7 @@ class RadarSystem:
     given protocols.
     """
 
-    def __init__(self, protocols: List[str]) -> None:
+    def __init__(self, protocols: List[str], vectorized: bool = False) -> None:
         """
         Initializes the RadarSystem with the provided filtering and sorting protocols.
 
@@ -82,25 +327,20 @@ class RadarSystem:
                     'assist-allies'
                     'closest-enemies'
                     'furthest-enemies'
+            vectorized (bool): Whether find_next_target should use the NumPy
+                engine instead of evaluating each target in Python.
 
         Creates:
             filters (List[Filter]): A list of Filter objects based on the given protocols.
             sorting_methods (List[SortingMethod]): A list of SortingMethod objects based on the given protocols.
         """
+        self.vectorized = vectorized
         self.filters = [DistanceFilter(100)]
         self.sorting_methods = []
 
-        protocol_map = {
-            'avoid-mech': MechFilter(),
-            'prioritize-mech': PrioritizeMechFilter(),
-            'avoid-crossfire': CrossfireFilter(),
-            'assist-allies': AlliesSort(),
-            'closest-enemies': ClosestEnemiesSort(),
-            'furthest-enemies': FurthestEnemiesSort(),
-        }
-
         for protocol in protocols:
-            instance = protocol_map.get(protocol)
+            protocol_class = PROTOCOL_CLASSES.get(protocol)
+            instance = protocol_class() if protocol_class else None
             if isinstance(instance, Filter):
                 self.filters.append(instance)
             elif isinstance(instance, SortingMethod):
@@ -115,11 +355,575 @@ class RadarSystem:
         return targets
 
     def find_next_target(self, targets: List[ScanData]) -> ScanData:
-        filtered_targets = self._apply_filters(targets)
+        strategy = engine_dispatcher.choose(
+            len(targets), len(self.filters), len(self.sorting_methods), vectorized=self.vectorized, parallel=False,
+        )
+        engine_dispatcher.record(strategy, len(targets))
+        if strategy == 'vectorized':
+            try:
+                return _find_next_target_vectorized(targets, self.filters, self.sorting_methods)
+            except ColumnRangeError:
+                pass
+
+        selected_targets = self._find_top_targets_python(targets, 1)
+
+        if not selected_targets:
+            raise ValueError('No valid targets found')
+
+        return selected_targets[0]
+
+    def find_top_targets(self, targets: List[ScanData], k: int) -> List[ScanData]:
+        """
+        Finds the k best targets, in the same order _sort_targets would return them,
+        without sorting the whole scan.
+
+        Args:
+            targets (List[ScanData]): The scanned points.
+            k (int): The maximum number of targets to return.
+
+        Returns:
+            List[ScanData]: Up to k targets, empty if no target passes the filters.
+        """
+        if self.vectorized:
+            try:
+                return [targets[i] for i in _rank_targets_vectorized(targets, self.filters, self.sorting_methods)[:k]]
+            except ColumnRangeError:
+                pass
+        return self._find_top_targets_python(targets, k)
+
+    def _find_top_targets_python(self, targets: List[ScanData], k: int) -> List[ScanData]:
+        candidates = (t for t in targets if all(f.is_valid(t) for f in self.filters))
+        return _select_targets(candidates, _fuse_sort_keys(tuple(self.sorting_methods)), k)
+
+
+def _fuse_filters(filters: Tuple[Filter, ...]) -> Callable[[ScanData], bool]:
+    checks = tuple(f.is_valid for f in filters)
+
+    def predicate(target: ScanData) -> bool:
+        for check in checks:
+            if not check(target):
+                return False
+        return True
+
+    return predicate
+
+
+def _fuse_sort_keys(sorting_methods: Tuple[SortingMethod, ...]) -> Optional[Callable[[ScanData], tuple]]:
+    # Successive stable sorts make the last sorting method the primary key and
+    # leave ties in scan order, so one stable sort by the reversed keys is equivalent.
+    keys = tuple(sorting_method.key for sorting_method in reversed(sorting_methods))
+    if not keys:
+        return None
+    return lambda target: tuple(key(target) for key in keys)
+
+
+# Filters that never reject still get a finite rank, so they keep a stable order among themselves.
+MIN_REJECTION_RATE = 1e-6
+
+
+class FilterStatistics:
+    """
+    FilterStatistics tracks, for every filter class, how many targets it evaluated
+    and rejected and how long that took, and ranks the filters by their expected
+    cost per rejected target, so the cheapest, most selective ones run first.
+
+    A filter only sees the targets earlier filters let through, so its rates are
+    measured under the current order; the counts are halved at every reorder to
+    keep following the traffic.
+    """
+
+    def __init__(self, reorder_every: int) -> None:
+        self.reorder_every = reorder_every
+        self.version = 0
+        self._counts: Dict[str, List[float]] = {}  # evaluated, rejected, seconds
+        self._ranks: Dict[str, float] = {}
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, name: str, evaluated: int, rejected: int, seconds: float) -> None:
+        if not evaluated:
+            return
+        with self._lock:
+            counts = self._counts.setdefault(name, [0, 0, 0.0])
+            counts[0] += evaluated
+            counts[1] += rejected
+            counts[2] += seconds
+
+    def sampled(self) -> None:
+        """Marks the end of one measured evaluation, reordering every reorder_every of them."""
+        with self._lock:
+            self._samples += 1
+            if self._samples >= self.reorder_every:
+                self._samples = 0
+                self._reorder()
+
+    def _reorder(self) -> None:
+        ranks = {name: self._rank(counts) for name, counts in self._counts.items()}
+        if sorted(ranks, key=ranks.get) != sorted(self._ranks, key=self._ranks.get):
+            self.version += 1
+        self._ranks = ranks
+        for counts in self._counts.values():
+            counts[0] /= 2
+            counts[1] /= 2
+            counts[2] /= 2
+
+    @staticmethod
+    def _rank(counts: List[float]) -> float:
+        evaluated, rejected, seconds = counts
+        return (seconds / evaluated) / max(rejected / evaluated, MIN_REJECTION_RATE)
+
+    def order(self, filters: Iterable[Filter]) -> Tuple[Filter, ...]:
+        """Sorts filters by rank; filters not ranked yet run first, to be measured."""
+        ranks = self._ranks
+        return tuple(sorted(filters, key=lambda f: ranks.get(type(f).__name__, 0.0)))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = {}
+            self._ranks = {}
+            self._samples = 0
+            self.version += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the current order and, for every filter, its counts, rates and rank."""
+        with self._lock:
+            filters = {
+                name: {
+                    'evaluated': counts[0],
+                    'rejected': counts[1],
+                    'rejection_rate': counts[1] / counts[0] if counts[0] else 0.0,
+                    'seconds_per_target': counts[2] / counts[0] if counts[0] else 0.0,
+                    'rank': self._ranks.get(name),
+                }
+                for name, counts in self._counts.items()
+            }
+            ranks = dict(self._ranks)
+        return {
+            'adaptive': settings.adaptive_filters,
+            'version': self.version,
+            'order': sorted(ranks, key=ranks.get),
+            'filters': filters,
+        }
+
+
+filter_statistics = FilterStatistics(reorder_every=settings.adaptive_filter_reorder_every)
+
+
+class FilterChain:
+    """
+    FilterChain evaluates the filters of a plan in the order ranked by
+    filter_statistics, rebuilding its fused predicate whenever that order changes.
+    Filters only remove targets, so their order never changes the result.
+
+    Every adaptive_filter_sample_every calls, or every call when metrics are
+    enabled, the filters are applied one at a time to measure each of them.
+    Chains that are not instrumented never record statistics or metrics.
+    """
+
+    def __init__(self, filters: Tuple[Filter, ...], instrumented: bool = True) -> None:
+        self.filters = filters
+        self.instrumented = instrumented
+        self._version = -1
+        self._order = filters
+        self._predicate = _fuse_filters(filters)
+        self._calls = 0
+
+    def _refresh(self) -> None:
+        if settings.adaptive_filters and self._version != filter_statistics.version:
+            self._version = filter_statistics.version
+            order = filter_statistics.order(self.filters)
+            self._order, self._predicate = order, _fuse_filters(order)
+
+    @property
+    def order(self) -> Tuple[Filter, ...]:
+        self._refresh()
+        return self._order
+
+    @property
+    def predicate(self) -> Callable[[ScanData], bool]:
+        self._refresh()
+        return self._predicate
+
+    def apply(self, targets: List[ScanData]) -> List[ScanData]:
+        self._refresh()
+        if not self.instrumented:
+            return list(filter(self._predicate, targets))
+        self._calls += 1
+        sample = settings.adaptive_filters and self._calls % settings.adaptive_filter_sample_every == 0
+        if not metrics.registry.enabled and not sample:
+            return list(filter(self._predicate, targets))
+
+        # Applying one filter at a time calls is_valid exactly as often as the
+        # short-circuiting predicate, while measuring what each filter rejects.
+        candidates = targets
+        for f in self._order:
+            evaluated = len(candidates)
+            start = time.perf_counter()
+            candidates = [t for t in candidates if f.is_valid(t)]
+            seconds = time.perf_counter() - start
+            rejected = evaluated - len(candidates)
+            if metrics.registry.enabled:
+                _count_filter(f, evaluated, rejected)
+            filter_statistics.record(type(f).__name__, evaluated, rejected, seconds)
+        if settings.adaptive_filters:
+            filter_statistics.sampled()
+        return candidates
+
+
+ENGINE_STRATEGIES = ('python', 'vectorized', 'parallel')
+
+
+class CostModel:
+    """
+    CostModel predicts the seconds each strategy takes to rank a scan as
+
+        fixed + size * (per_target + filters * per_filter + sorts * per_sort)
+
+    with one set of coefficients per strategy, fitted from calibration samples.
+    """
+
+    def __init__(self, coefficients: Dict[str, Tuple[float, float, float, float]]) -> None:
+        self.coefficients = coefficients
+
+    @classmethod
+    def fit(cls, samples: Dict[str, List[Tuple[int, int, int, float]]]) -> 'CostModel':
+        """
+        Fits the coefficients of every strategy by least squares.
+
+        Args:
+            samples (Dict[str, List[Tuple[int, int, int, float]]]): The (scan size,
+                filter count, sort count, seconds) measurements of each strategy.
+        """
+        coefficients = {}
+        for strategy, measurements in samples.items():
+            features = np.array([(1, size, size * filters, size * sorts) for size, filters, sorts, _ in measurements])
+            seconds = np.array([measurement[3] for measurement in measurements])
+            solution = np.linalg.lstsq(features.astype(float), seconds, rcond=None)[0]
+            # Negative coefficients only fit the noise and would reward bigger scans.
+            coefficients[strategy] = tuple(float(max(value, 0.0)) for value in solution)
+        return cls(coefficients)
+
+    def predict(self, strategy: str, size: int, filters: int, sorts: int) -> float:
+        """Returns the predicted seconds, infinite for a strategy that was not calibrated."""
+        coefficients = self.coefficients.get(strategy)
+        if coefficients is None:
+            return inf
+        fixed, per_target, per_filter, per_sort = coefficients
+        return fixed + size * (per_target + filters * per_filter + sorts * per_sort)
+
+
+class EngineDispatcher:
+    """
+    EngineDispatcher picks the strategy that ranks a scan: plain Python, the
+    NumPy engine or the process pool shards. All of them return the same targets.
+
+    RADAR_ENGINE_STRATEGY forces a strategy. Otherwise, once calibrate_engines has
+    fitted a cost model, the strategy predicted to be the fastest for the scan size
+    and protocol mix runs; before that, scans of at least RADAR_PARALLEL_SCAN_THRESHOLD
+    points are sharded and the rest run in Python. The parallel strategy needs a
+    process pool, so it is skipped where app.sharding cannot shard.
+    """
+
+    def __init__(self) -> None:
+        self.model: Optional[CostModel] = None
+        self.last: Optional[str] = None
+
+    def choose(self, size: int, filters: int, sorts: int, vectorized: bool = False, parallel: bool = True) -> str:
+        """
+        Returns the strategy for a scan.
+
+        Args:
+            size (int): The number of scanned points.
+            filters (int): The number of filters, the distance filter included.
+            sorts (int): The number of sorting methods.
+            vectorized (bool): Whether the caller asked for the NumPy engine, which
+                then replaces the Python one.
+            parallel (bool): Whether the caller can run the parallel strategy.
+        """
+        forced = settings.engine_strategy
+        if forced is not None and (forced != 'parallel' or parallel and _can_shard()):
+            return forced
+
+        sequential = 'vectorized' if vectorized else 'python'
+        parallel = parallel and settings.parallel_scan_threshold > 0
+        model = self.model
+        if model is None:
+            return 'parallel' if parallel and settings.parallel_scan_threshold <= size and _can_shard() else sequential
+
+        costs = {strategy: model.predict(strategy, size, filters, sorts) for strategy in ENGINE_STRATEGIES}
+        if not vectorized and costs['vectorized'] < costs['python']:
+            sequential = 'vectorized'
+        if parallel and costs['parallel'] < costs[sequential] and _can_shard():
+            return 'parallel'
+        return sequential
+
+    def record(self, strategy: str, size: int) -> None:
+        self.last = strategy
+        metrics.engine_strategy_total.inc((strategy,))
+        logger.debug('Ranked a scan of %d points with the %s strategy', size, strategy)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the forced strategy, the fitted cost model and how often each strategy ran."""
+        return {
+            'forced': settings.engine_strategy,
+            'calibrated': self.model is not None,
+            'model': dict(self.model.coefficients) if self.model is not None else None,
+            'last': self.last,
+            'runs': {strategy: metrics.engine_strategy_total.value((strategy,)) for strategy in ENGINE_STRATEGIES},
+        }
+
 
-        if not filtered_targets:
+def _can_shard() -> bool:
+    # Imported here since app.sharding depends on this module.
+    from app import sharding
+    return sharding.can_shard()
+
+
+engine_dispatcher = EngineDispatcher()
+
+
+@dataclass(frozen=True)
+class ProtocolPlan:
+    """
+    ProtocolPlan is an immutable, precompiled version of a RadarSystem. It holds
+    a filter chain that evaluates all the filters with a single fused predicate
+    and a single composite sort key that reproduces the stable multi-pass sort
+    of RadarSystem.
+
+    Plans are built by compile_protocols and shared between requests, so they
+    must never be modified; only the filter chain reorders itself.
+    """
+    protocols: Tuple[str, ...]
+    filters: Tuple[Filter, ...]
+    sorting_methods: Tuple[SortingMethod, ...]
+    filter_chain: FilterChain
+    sort_key: Optional[Callable[[ScanData], tuple]]
+
+    @property
+    def predicate(self) -> Callable[[ScanData], bool]:
+        return self.filter_chain.predicate
+
+    def find_next_target(
+        self, targets: List[ScanData], vectorized: bool = False, strategy: Optional[str] = None
+    ) -> ScanData:
+        """
+        Finds the next target following the compiled protocols.
+
+        Args:
+            targets (List[ScanData]): The scanned points.
+            vectorized (bool): Whether to use the NumPy engine instead of the Python one.
+            strategy (Optional[str]): The strategy to use, instead of the one chosen
+                by engine_dispatcher.
+
+        Raises:
+            ValueError: If no target passes the filters.
+        """
+        selected_targets = self.find_top_targets(targets, 1, vectorized=vectorized, strategy=strategy)
+
+        if not selected_targets:
+            metrics.no_target_total.inc((','.join(self.protocols),))
             raise ValueError('No valid targets found')
 
-        sorted_targets = self._sort_targets(filtered_targets)
+        return selected_targets[0]
+
+    def find_top_targets(
+        self, targets: List[ScanData], k: int, vectorized: bool = False, strategy: Optional[str] = None
+    ) -> List[ScanData]:
+        """
+        Finds the k best targets following the compiled protocols, with the strategy
+        chosen by engine_dispatcher: a bounded heap instead of a full sort in Python,
+        the NumPy engine or shards of the scan across the process pool. Every
+        strategy returns the same targets.
+
+        Args:
+            targets (List[ScanData]): The scanned points.
+            k (int): The maximum number of targets to return.
+            vectorized (bool): Whether to use the NumPy engine instead of the Python one.
+            strategy (Optional[str]): The strategy to use, instead of the one chosen
+                by engine_dispatcher.
+
+        Returns:
+            List[ScanData]: Up to k targets, best first, empty if no target passes the filters.
+        """
+        metrics.describe(self.protocols, len(targets))
+
+        if strategy is None:
+            strategy = engine_dispatcher.choose(
+                len(targets), len(self.filters), len(self.sorting_methods), vectorized=vectorized,
+            )
+            engine_dispatcher.record(strategy, len(targets))
+
+        try:
+            if strategy == 'parallel':
+                from app import sharding
+                return sharding.find_top_targets_sharded(self, targets, k)
+            if strategy == 'vectorized':
+                ranking = _rank_targets_vectorized(
+                    targets, self.filters, self.sorting_methods, self.filter_chain.instrumented,
+                )
+                return [targets[i] for i in ranking[:k]]
+        except ColumnRangeError:
+            logger.debug('Ranking a scan with values beyond the int64 range in Python')
+
+        candidates = self.filter_chain.apply(targets)
+        metrics.mark('filter')
+        selected_targets = _select_targets(candidates, self.sort_key, k)
+        metrics.mark('sort')
+        return selected_targets
+
+    def find_next_index(self, columns: ScanColumns) -> int:
+        """
+        Finds the position of the next target in a scan given in column form.
+
+        Args:
+            columns (ScanColumns): The scan in column form.
 
-        return sorted_targets[0]
+        Raises:
+            ValueError: If no target passes the filters.
+        """
+        metrics.describe(self.protocols, len(columns))
+        ranking = _rank_columns(columns, self.filters, self.sorting_methods)
+
+        if not ranking.size:
+            metrics.no_target_total.inc((','.join(self.protocols),))
+            raise ValueError('No valid targets found')
+
+        return int(ranking[0])
+
+
+def normalize_protocols(protocols: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Normalizes a protocol list into the canonical tuple used as plan cache key.
+
+    Unknown protocols are dropped, filters are deduplicated and placed in a fixed
+    order (their order does not change the result) and, for sorting protocols,
+    only the last occurrence is kept, since an earlier sort by the same key is
+    overridden by the later one.
+
+    Args:
+        protocols (Iterable[str]): The protocols as received in the request.
+
+    Returns:
+        Tuple[str, ...]: The filter protocols followed by the sorting protocols.
+    """
+    names = [getattr(protocol, 'value', protocol) for protocol in protocols]
+    names = [name for name in names if name in PROTOCOL_CLASSES]
+
+    filters = [
+        name for name, protocol_class in PROTOCOL_CLASSES.items()
+        if issubclass(protocol_class, Filter) and name in names
+    ]
+    sorts = [
+        name for position, name in enumerate(names)
+        if issubclass(PROTOCOL_CLASSES[name], SortingMethod) and name not in names[position + 1:]
+    ]
+    return tuple(filters + sorts)
+
+
+def build_plan(protocols: Iterable[str], instrumented: bool = True) -> ProtocolPlan:
+    """
+    Compiles a new ProtocolPlan, outside the plan cache.
+
+    Args:
+        protocols (Iterable[str]): The protocols as received in the request.
+        instrumented (bool): Whether the plan records filter statistics and metrics;
+            plans evaluating synthetic scans, like calibration, must not.
+    """
+    protocols = normalize_protocols(protocols)
+    radar_system = RadarSystem(list(protocols))
+    filters = tuple(radar_system.filters)
+    sorting_methods = tuple(radar_system.sorting_methods)
+    return ProtocolPlan(
+        protocols=protocols,
+        filters=filters,
+        sorting_methods=sorting_methods,
+        filter_chain=FilterChain(filters, instrumented),
+        sort_key=_fuse_sort_keys(sorting_methods),
+    )
+
+
+@lru_cache(maxsize=settings.plan_cache_size)
+def _compile_normalized_protocols(protocols: Tuple[str, ...]) -> ProtocolPlan:
+    return build_plan(protocols)
+
+
+def compile_protocols(protocols: Iterable[str]) -> ProtocolPlan:
+    """
+    Returns the ProtocolPlan for the given protocols, reusing a cached plan when
+    an equivalent protocol list was compiled before.
+
+    Args:
+        protocols (Iterable[str]): The protocols as received in the request.
+    """
+    plan = _compile_normalized_protocols(normalize_protocols(protocols))
+    metrics.mark('plan')
+    return plan
+
+
+def plan_cache_info():
+    """Returns the hits, misses, maxsize and currsize counters of the plan cache."""
+    return _compile_normalized_protocols.cache_info()
+
+
+def _plan_cache_metrics() -> List[str]:
+    info = plan_cache_info()
+    return [
+        '# HELP radar_plan_cache_hits_total Protocol plans served from the cache.',
+        '# TYPE radar_plan_cache_hits_total counter',
+        f'radar_plan_cache_hits_total {info.hits}',
+        '# HELP radar_plan_cache_misses_total Protocol plans compiled on a cache miss.',
+        '# TYPE radar_plan_cache_misses_total counter',
+        f'radar_plan_cache_misses_total {info.misses}',
+    ]
+
+
+metrics.registry.add_collector(_plan_cache_metrics)
+
+
+class TargetTracker:
+    """
+    TargetTracker keeps the k best targets seen so far under a ProtocolPlan, so a
+    scan can be evaluated point by point, as it arrives, without holding it in memory.
+
+    The targets are kept in a heap of at most k entries ordered by the plan sort
+    key and by arrival position, which resolves ties like the stable sorts do.
+    """
+
+    def __init__(self, plan: ProtocolPlan, k: int = 1) -> None:
+        self.plan = plan
+        self.k = k
+        self.count = 0
+        self._heap: List[Tuple[tuple, int, ScanData]] = []
+
+    def push(self, target: ScanData) -> bool:
+        """
+        Offers the next scanned point to the tracker.
+
+        Args:
+            target (ScanData): The next point of the scan.
+
+        Returns:
+            bool: Whether the target is currently one of the k best.
+        """
+        position = self.count
+        self.count += 1
+
+        if not self.plan.predicate(target):
+            return False
+
+        key = self.plan.sort_key(target) if self.plan.sort_key else ()
+        # heapq is a min-heap, so keys and positions are negated to keep the
+        # worst tracked target at the top, ready to be replaced.
+        entry = (tuple(-value for value in key), -position, target)
+
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if self._heap and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def targets(self) -> List[ScanData]:
+        """Returns the tracked targets, best first."""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
@@ -0,0 +1,241 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from math import inf
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.schemas import ScanData, SessionDelta
+from app.services import (
+    ClosestEnemiesSort,
+    CrossfireFilter,
+    DistanceFilter,
+    FurthestEnemiesSort,
+    MechFilter,
+    PrioritizeMechFilter,
+    ProtocolPlan,
+)
+
+# Buckets are keyed by (is_mech, has_allies).
+BucketKey = Tuple[bool, bool]
+BUCKET_KEYS: Tuple[BucketKey, ...] = ((False, False), (False, True), (True, False), (True, True))
+
+
+class SessionNotFoundError(KeyError):
+    pass
+
+
+class SessionDeltaError(ValueError):
+    pass
+
+
+class BattlefieldSession:
+    """
+    BattlefieldSession keeps the scanned points of a battlefield between ticks, so
+    radars only need to send what changed.
+
+    Points are indexed in one bucket per enemy type and allies presence, each one
+    a list of (distance, sequence) entries kept sorted by distance from the origin.
+    The sequence is the position the point was added at and plays the role of the
+    scan order when breaking ties, exactly like the stable sorts of RadarSystem.
+
+    Deltas and searches hold a lock, since searches may run in radar_executor's
+    threads while the event loop applies the next delta.
+    """
+
+    def __init__(self, session_id: str, max_points: int) -> None:
+        self.session_id = session_id
+        self.max_points = max_points
+        self.last_access = 0.0
+        self._next_sequence = 0
+        self._points: Dict[str, Tuple[int, ScanData]] = {}
+        self._targets: Dict[int, ScanData] = {}
+        self._buckets: Dict[BucketKey, List[Tuple[float, int]]] = {key: [] for key in BUCKET_KEYS}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sessions are copied to process pools, which cannot share the lock or the mutable indexes.
+        with self._lock:
+            state = dict(self.__dict__, _points=dict(self._points), _targets=dict(self._targets))
+            state['_buckets'] = {key: list(bucket) for key, bucket in self._buckets.items()}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    @staticmethod
+    def _bucket_key(target: ScanData) -> BucketKey:
+        return target.enemies.type == 'mech', target.allies is not None
+
+    def _index(self, sequence: int, target: ScanData) -> None:
+        self._targets[sequence] = target
+        insort(self._buckets[self._bucket_key(target)], (DistanceFilter.distance(target), sequence))
+
+    def _unindex(self, sequence: int, target: ScanData) -> None:
+        del self._targets[sequence]
+        bucket = self._buckets[self._bucket_key(target)]
+        del bucket[bisect_left(bucket, (DistanceFilter.distance(target), sequence))]
+
+    def apply(self, delta: SessionDelta) -> None:
+        """
+        Applies the added, updated and removed points of a delta. The delta is
+        checked before any change is made, so it is applied entirely or not at all.
+
+        Args:
+            delta (SessionDelta): The changes since the previous tick.
+
+        Raises:
+            SessionDeltaError: If an added point already exists, an updated or removed
+                point does not exist, a point is updated twice or both updated and
+                removed, or the session would exceed its maximum size.
+        """
+        with self._lock:
+            added_ids = [point.id for point in delta.add]
+            updated_ids = [point.id for point in delta.update]
+            missing_ids = [point.id for point in delta.update if point.id not in self._points]
+            missing_ids += [point_id for point_id in delta.remove if point_id not in self._points]
+            if any(point_id in self._points for point_id in added_ids) or len(set(added_ids)) != len(added_ids):
+                raise SessionDeltaError('Added points must have new, unique ids')
+            if missing_ids:
+                raise SessionDeltaError(f'Unknown point ids: {", ".join(missing_ids)}')
+            removed_ids = set(delta.remove)
+            if len(set(updated_ids)) != len(updated_ids) or not removed_ids.isdisjoint(updated_ids):
+                raise SessionDeltaError('Updated points must have unique ids that are not removed')
+            if len(self._points) - len(removed_ids) + len(added_ids) > self.max_points:
+                raise SessionDeltaError(f'Sessions are limited to {self.max_points} points')
+
+            for point_id in removed_ids:
+                sequence, target = self._points.pop(point_id)
+                self._unindex(sequence, target)
+            for point in delta.update:
+                sequence, target = self._points[point.id]
+                self._unindex(sequence, target)
+                self._points[point.id] = (sequence, point)
+                self._index(sequence, point)
+            for point in delta.add:
+                sequence = self._next_sequence
+                self._next_sequence += 1
+                self._points[point.id] = (sequence, point)
+                self._index(sequence, point)
+
+    def _candidate_buckets(self, plan: ProtocolPlan) -> Optional[Tuple[List[List[Tuple[float, int]]], float]]:
+        keys = set(BUCKET_KEYS)
+        max_distance = inf
+        for f in plan.filters:
+            if isinstance(f, DistanceFilter):
+                max_distance = min(max_distance, f.max_distance)
+            elif isinstance(f, MechFilter):
+                keys -= {key for key in keys if key[0]}
+            elif isinstance(f, PrioritizeMechFilter):
+                keys -= {key for key in keys if not key[0]}
+            elif isinstance(f, CrossfireFilter):
+                keys -= {key for key in keys if key[1]}
+            else:
+                return None
+        return [self._buckets[key] for key in BUCKET_KEYS if key in keys], max_distance
+
+    def find_next_target(self, plan: ProtocolPlan) -> ScanData:
+        """
+        Finds the next target among the points of the session, with the same result
+        RadarSystem would give for a scan listing the points in the order they were added.
+
+        The distance cutoff and closest/furthest orderings are answered by binary
+        search on the buckets; other orderings scan the points within range.
+
+        Args:
+            plan (ProtocolPlan): The compiled protocols to apply.
+
+        Raises:
+            ValueError: If no point passes the filters.
+        """
+        with self._lock:
+            targets = self._candidates(plan)
+        return plan.find_next_target(targets)
+
+    def _candidates(self, plan: ProtocolPlan) -> List[ScanData]:
+        candidates = self._candidate_buckets(plan)
+        if candidates is None:
+            return [self._targets[sequence] for sequence in sorted(self._targets)]
+
+        buckets, max_distance = candidates
+        ranges = [(bucket, bisect_right(bucket, (max_distance, inf))) for bucket in buckets]
+        ranges = [(bucket, end) for bucket, end in ranges if end]
+        primary = plan.sorting_methods[-1] if plan.sorting_methods else None
+
+        if isinstance(primary, ClosestEnemiesSort):
+            distance = min(bucket[0][0] for bucket, _ in ranges) if ranges else None
+            entries = [
+                entry for bucket, end in ranges
+                for entry in bucket[:min(end, bisect_right(bucket, (distance, inf)))]
+            ]
+        elif isinstance(primary, FurthestEnemiesSort):
+            distance = max(bucket[end - 1][0] for bucket, end in ranges) if ranges else None
+            entries = [entry for bucket, end in ranges for entry in bucket[bisect_left(bucket, (distance, -inf)):end]]
+        else:
+            entries = [entry for bucket, end in ranges for entry in bucket[:end]]
+
+        # Every remaining candidate ties on the primary ordering, if any, so the plan
+        # only has to resolve the secondary keys among them, in scan order.
+        return [self._targets[sequence] for _, sequence in sorted(entries, key=lambda e: e[1])]
+
+
+class SessionStore:
+    """
+    SessionStore holds the battlefield sessions of a worker, evicting the ones that
+    have been idle for longer than idle_timeout seconds and, when max_sessions is
+    reached, the least recently used one.
+    """
+
+    def __init__(
+        self, max_sessions: int, max_points: int, idle_timeout: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_points = max_points
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._sessions: 'OrderedDict[str, BattlefieldSession]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def evict_idle(self) -> None:
+        deadline = self.clock() - self.idle_timeout
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access > deadline:
+                break
+            del self._sessions[session.session_id]
+
+    def create(self) -> BattlefieldSession:
+        self.evict_idle()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+        session = BattlefieldSession(uuid.uuid4().hex, self.max_points)
+        session.last_access = self.clock()
+        self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> BattlefieldSession:
+        """
+        Returns a session and marks it as recently used.
+
+        Raises:
+            SessionNotFoundError: If the session does not exist or was evicted.
+        """
+        self.evict_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        session.last_access = self.clock()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> None:
+        if self._sessions.pop(session_id, None) is None:
+            raise SessionNotFoundError(session_id)
@@ -0,0 +1,98 @@
+import heapq
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app import metrics
+from app.batch import batch_workers, get_process_pool, is_pool_worker, split_batch
+from app.schemas import ScanData
+from app.services import (
+    ProtocolPlan,
+    ScanColumns,
+    _rank_columns,
+    clipped_coordinates,
+    compile_protocols,
+    int64_column,
+)
+
+# The scan is shared as one int64 row per column, in ScanColumns.from_arrays order.
+SHARED_COLUMNS = 5
+
+Candidate = Tuple[tuple, int]
+
+
+def _best_in_shard(name: str, count: int, start: int, end: int, protocols: Tuple[str, ...], k: int) -> List[Candidate]:
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Copying the shard releases the shared buffer right away; it is cheap next to filtering it.
+        shard = np.ndarray((SHARED_COLUMNS, count), dtype=np.int64, buffer=shm.buf)[:, start:end].copy()
+    finally:
+        shm.close()
+
+    plan = compile_protocols(protocols)
+    columns = ScanColumns.from_arrays(*shard)
+    ranking = _rank_columns(columns, plan.filters, plan.sorting_methods)[:k]
+    # Keys are listed primary first, like the composite key of the plan.
+    keys = [sorting_method.sort_key(columns) for sorting_method in reversed(plan.sorting_methods)]
+    return [(tuple(key[position].item() for key in keys), start + int(position)) for position in ranking]
+
+
+def find_top_targets_sharded(
+    plan: ProtocolPlan, targets: List[ScanData], k: int, shards: Optional[int] = None
+) -> List[ScanData]:
+    """
+    Finds the k best targets of a scan with the process pool: the scan is copied
+    once into shared memory as columns, every worker ranks one contiguous shard
+    and returns its k best candidates with their sort keys and scan positions,
+    and the candidates are merged here.
+
+    Merging by (sort key, scan position) gives the same order as the stable sorts
+    of RadarSystem, so the result is identical to the sequential engines.
+
+    Args:
+        plan (ProtocolPlan): The compiled protocols.
+        targets (List[ScanData]): The scanned points.
+        k (int): The maximum number of targets to return.
+        shards (Optional[int]): The number of shards; one per pool worker by default.
+
+    Returns:
+        List[ScanData]: Up to k targets, best first.
+
+    Raises:
+        ColumnRangeError: If an allies value does not fit in the shared int64 columns;
+            ProtocolPlan then ranks the scan in Python.
+    """
+    from multiprocessing import shared_memory
+
+    count = len(targets)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, SHARED_COLUMNS * count * 8))
+    try:
+        data = np.ndarray((SHARED_COLUMNS, count), dtype=np.int64, buffer=shm.buf)
+        data[0] = np.fromiter(clipped_coordinates(t.coordinates.x for t in targets), dtype=np.int64, count=count)
+        data[1] = np.fromiter(clipped_coordinates(t.coordinates.y for t in targets), dtype=np.int64, count=count)
+        data[2] = np.fromiter((t.enemies.type == 'mech' for t in targets), dtype=np.int64, count=count)
+        data[3] = np.fromiter((t.allies is not None for t in targets), dtype=np.int64, count=count)
+        data[4] = int64_column((t.allies if t.allies is not None else 0 for t in targets), count)
+        del data
+
+        pool = get_process_pool()
+        bounds = [(shard.start, shard.stop) for shard in split_batch(range(count), shards or batch_workers())]
+        futures = [
+            pool.submit(_best_in_shard, shm.name, count, start, end, plan.protocols, k) for start, end in bounds
+        ]
+        candidates = [candidate for future in futures for candidate in future.result()]
+    finally:
+        shm.close()
+        shm.unlink()
+    metrics.mark('filter')
+
+    selected = heapq.nsmallest(k, candidates)
+    metrics.mark('sort')
+    return [targets[position] for _, position in selected]
+
+
+def can_shard() -> bool:
+    """Returns whether this process can shard scans: pool workers have no pool of their own."""
+    return batch_workers() > 1 and not is_pool_worker()
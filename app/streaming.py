@@ -0,0 +1,105 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.config import settings
+from app.limits import check_scan_size
+from app.schemas import RadarStreamHeader, ScanData
+from app.services import TargetTracker, compile_protocols
+
+
+def _validation_error(line_number: int, errors: List[dict]) -> HTTPException:
+    detail = [{**error, 'loc': ['body', line_number, *error.get('loc', ())]} for error in errors]
+    return HTTPException(status_code=422, detail=detail)
+
+
+async def iter_ndjson(
+    chunks: AsyncIterable[bytes], max_line_size: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Decodes a newline-delimited JSON byte stream, yielding every non-empty line as
+    soon as it is complete. Only the current incomplete line is buffered, as a list
+    of pieces, so each chunk is scanned for newlines only once.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The raw body chunks.
+        max_line_size (Optional[int]): The maximum size of a line, in bytes;
+            RADAR_MAX_STREAM_LINE_SIZE by default.
+
+    Yields:
+        Tuple[int, Any]: The line number, starting at 0, and the decoded value.
+
+    Raises:
+        HTTPException: 413 if a line is longer than max_line_size, 422 if a line is not valid JSON.
+    """
+    if max_line_size is None:
+        max_line_size = settings.max_stream_line_size
+    pending: List[bytes] = []
+    pending_size = 0
+    line_number = 0
+    async for chunk in chunks:
+        *lines, rest = chunk.split(b'\n')
+        for line in lines:
+            if pending:
+                line = b''.join(pending) + line
+                pending, pending_size = [], 0
+            _check_line_size(line_number, len(line), max_line_size)
+            if line.strip():
+                yield line_number, _decode_line(line_number, line)
+            line_number += 1
+        if rest:
+            pending.append(rest)
+            pending_size += len(rest)
+            _check_line_size(line_number, pending_size, max_line_size)
+    line = b''.join(pending)
+    if line.strip():
+        yield line_number, _decode_line(line_number, line)
+
+
+def _check_line_size(line_number: int, size: int, max_line_size: int) -> None:
+    if size > max_line_size:
+        raise HTTPException(status_code=413, detail=f'Line {line_number} is longer than {max_line_size} bytes')
+
+
+def _decode_line(line_number: int, line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as error:
+        raise _validation_error(line_number, [{'loc': (), 'msg': str(error), 'type': 'value_error.jsondecode'}])
+
+
+async def track_stream(chunks: AsyncIterable[bytes], k: int = 1) -> List[ScanData]:
+    """
+    Finds the k best targets of a streamed radar request. The first line holds the
+    RadarStreamHeader with the protocols and every following line one ScanData.
+
+    Args:
+        chunks (AsyncIterable[bytes]): The raw body chunks.
+        k (int): The maximum number of targets to return.
+
+    Returns:
+        List[ScanData]: Up to k targets, best first.
+
+    Raises:
+        HTTPException: 422 if the header or a scan point is not valid, 413 if the
+            scan has more points than RADAR_MAX_SCAN_SIZE or a line is too long.
+    """
+    tracker = None
+    scan_size = 0
+    async for line_number, value in iter_ndjson(chunks):
+        try:
+            if tracker is None:
+                header = RadarStreamHeader.parse_obj(value)
+                tracker = TargetTracker(compile_protocols(header.protocols), k)
+            else:
+                scan_size += 1
+                check_scan_size(scan_size)
+                tracker.push(ScanData.parse_obj(value))
+        except ValidationError as error:
+            raise _validation_error(line_number, error.errors())
+
+    if tracker is None:
+        raise _validation_error(0, [{'loc': ('protocols',), 'msg': 'field required', 'type': 'value_error.missing'}])
+    return tracker.targets()
@@ -0,0 +1,33 @@
+import random
+from typing import Dict, List, Optional
+
+
+def generate_scan(
+    size: int,
+    mech_ratio: float = 0.2,
+    allies_ratio: float = 0.3,
+    spread: int = 150,
+    seed: Optional[int] = 0,
+) -> List[Dict]:
+    """
+    Generates a synthetic scan as JSON-compatible dicts, reproducible for a given seed.
+
+    Args:
+        size (int): The number of scanned points.
+        mech_ratio (float): The probability of a point holding mechs instead of soldiers.
+        allies_ratio (float): The probability of a point having allies.
+        spread (int): Coordinates are drawn uniformly from [-spread, spread]; points
+            further than 100 from the origin are rejected by every protocol.
+        seed (Optional[int]): The random seed.
+    """
+    rng = random.Random(seed)
+    scan = []
+    for _ in range(size):
+        point = {
+            'coordinates': {'x': rng.randint(-spread, spread), 'y': rng.randint(-spread, spread)},
+            'enemies': {'type': 'mech' if rng.random() < mech_ratio else 'soldier', 'number': rng.randint(1, 100)},
+        }
+        if rng.random() < allies_ratio:
+            point['allies'] = rng.randint(1, 20)
+        scan.append(point)
+    return scan
@@ -0,0 +1,23 @@
+"""Loaders for the radar test cases in test_cases.txt, shared by the test modules and the load generator."""
+import json
+from pathlib import Path
+from typing import List, Tuple
+
+from app.schemas import RadarRequest
+
+TEST_CASES_PATH = Path(__file__).resolve().parents[2] / 'test_cases.txt'
+
+
+def read_test_cases() -> List[Tuple[str, str]]:
+    """Reads the `input|expected output` lines of test_cases.txt, unparsed."""
+    with open(TEST_CASES_PATH) as test_cases_file:
+        lines = [line.strip() for line in test_cases_file if line.strip() and not line.startswith('#')]
+    return [(body, expected) for body, expected in (line.split('|') for line in lines)]
+
+
+def load_raw_test_cases():
+    return [body for body, _ in read_test_cases()]
+
+
+def load_test_cases():
+    return [(RadarRequest.parse_raw(body), json.loads(expected)) for body, expected in read_test_cases()]
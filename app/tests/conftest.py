@@ -0,0 +1,11 @@
+import pytest
+
+from app.config import settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def no_engine_calibration():
+    # Otherwise every TestClient startup calibrates the shared engine_dispatcher behind the tests' back.
+    settings.engine_calibration = False
+    yield
+    settings.engine_calibration = True
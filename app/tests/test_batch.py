@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.batch import (
+    evaluate_batch,
+    evaluate_request,
+    shutdown_process_pool,
+    split_batch,
+)
+from app.config import settings
+from app.main import app
+from app.schemas import Coordinates, RadarError, RadarRequest
+
+client = TestClient(app)
+
+VALID_REQUEST = {
+    'protocols': ['avoid-mech'],
+    'scan': [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}}, {'coordinates': {'x': 0, 'y': 80}, 'allies': 5, 'enemies': {'type': 'mech', 'number': 1}}],  # noqa: E501
+}
+EMPTY_REQUEST = {
+    'protocols': ['avoid-crossfire'],
+    'scan': [{'coordinates': {'x': 0, 'y': 80}, 'allies': 5, 'enemies': {'type': 'mech', 'number': 1}}],
+}
+
+
+def test_evaluate_request():
+    assert evaluate_request(RadarRequest.parse_obj(VALID_REQUEST)) == Coordinates(x=0, y=40)
+    assert evaluate_request(RadarRequest.parse_obj(EMPTY_REQUEST)) == RadarError(detail='No valid targets found')
+
+
+@pytest.mark.parametrize('size,chunks', [(10, 3), (2, 4), (0, 2), (7, 7)])
+def test_split_batch(size, chunks):
+    requests = list(range(size))
+    result = split_batch(requests, chunks)
+
+    assert [item for chunk in result for item in chunk] == requests
+    assert len(result) == min(size, chunks)
+    assert max(map(len, result), default=0) - min(map(len, result), default=0) <= 1
+
+
+def test_evaluate_batch_in_process_pool(monkeypatch):
+    monkeypatch.setattr(settings, 'batch_workers', 2)
+    monkeypatch.setattr(settings, 'batch_parallel_threshold', 1)
+    requests = [RadarRequest.parse_obj(data) for data in [VALID_REQUEST, EMPTY_REQUEST] * 3]
+
+    try:
+        results = asyncio.run(evaluate_batch(requests))
+    finally:
+        shutdown_process_pool()
+
+    assert results == [Coordinates(x=0, y=40), RadarError(detail='No valid targets found')] * 3
+
+
+def test_radar_batch_endpoint():
+    response = client.post('/radar/batch', json=[VALID_REQUEST, EMPTY_REQUEST, VALID_REQUEST])
+    assert response.status_code == 200
+    assert response.json() == [{'x': 0, 'y': 40}, {'detail': 'No valid targets found'}, {'x': 0, 'y': 40}]
+
+
+def test_radar_batch_endpoint_validation_error():
+    response = client.post('/radar/batch', json=[VALID_REQUEST, {'protocols': ['unknown'], 'scan': []}])
+    assert response.status_code == 422
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.schemas import ScanData
+from benchmarks.radar import _run_endpoint, compare, measure, run
+from benchmarks.scans import all_protocol_mixes, generate_scan
+from benchmarks.startup import STAGES, measure_cold_start
+
+
+def test_generate_scan_is_reproducible():
+    scan = generate_scan(500, mech_ratio=0.5, allies_ratio=0.0, spread=10, seed=3)
+
+    assert scan == generate_scan(500, mech_ratio=0.5, allies_ratio=0.0, spread=10, seed=3)
+    assert scan != generate_scan(500, mech_ratio=0.5, allies_ratio=0.0, spread=10, seed=4)
+    assert all(abs(point['coordinates']['x']) <= 10 and 'allies' not in point for point in scan)
+    assert 150 < sum(point['enemies']['type'] == 'mech' for point in scan) < 350
+    assert all(ScanData.parse_obj(point) for point in scan)
+
+
+def test_all_protocol_mixes():
+    mixes = all_protocol_mixes()
+
+    assert len(mixes) == 8 * 16
+    assert [] in mixes
+    assert ['avoid-mech', 'furthest-enemies', 'assist-allies'] in mixes
+
+
+def test_measure():
+    result = measure(lambda: None, repeat=3, min_time=0.001)
+
+    assert result['repeat'] == 3
+    assert result['number'] >= 1
+    assert 0 <= result['min'] <= result['median']
+
+
+def test_run_raises_request_limits_for_the_endpoint(monkeypatch):
+    monkeypatch.setattr(settings, 'max_scan_size', 5)
+    monkeypatch.setattr(settings, 'max_body_size', 100)
+
+    result = run([20], [['closest-enemies'], ['avoid-mech', 'prioritize-mech']], repeat=1)
+
+    assert [entry['size'] for entry in result['results'] if entry['name'] == 'POST /radar'] == [20, 20]
+    assert (settings.max_scan_size, settings.max_body_size) == (5, 100)
+
+
+def test_run_endpoint_rejects_unexpected_statuses(monkeypatch):
+    monkeypatch.setattr(settings, 'max_scan_size', 5)
+    raw_scan = generate_scan(20)
+
+    with pytest.raises(RuntimeError, match='answered 413 instead of 200'):
+        _run_endpoint(TestClient(app), raw_scan, [ScanData.parse_obj(point) for point in raw_scan], [], 20, 1)
+
+
+def test_compare_flags_regressions():
+    baseline = {'results': [
+        {'name': 'stage', 'size': 10, 'protocols': ['avoid-mech'], 'median': 1.0},
+        {'name': 'stage', 'size': 100, 'protocols': [], 'median': 1.0},
+    ]}
+    current = {'results': [
+        {'name': 'stage', 'size': 10, 'protocols': ['avoid-mech'], 'median': 1.1},
+        {'name': 'stage', 'size': 100, 'protocols': [], 'median': 1.5},
+        {'name': 'stage', 'size': 1000, 'protocols': [], 'median': 9.0},
+    ]}
+    comparison = compare(baseline, current, threshold=0.2)
+
+    assert [(entry['key'], entry['regressed']) for entry in comparison] == [
+        ('stage|10|avoid-mech', False),
+        ('stage|100|', True),
+    ]
+
+
+def test_measure_cold_start():
+    result = measure_cold_start(production=True)
+
+    assert set(result) == set(STAGES)
+    assert 0 < result['import'] < result['total']
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import InMemoryCacheBackend, ResultCache, request_key, result_cache
+from app.config import settings
+from app.main import app
+from app.schemas import RadarRequest
+from app.services import compile_protocols
+from app.tests.cases import load_test_cases
+
+client = TestClient(app, raise_server_exceptions=False)
+
+RADAR_REQUEST = {
+    'protocols': ['closest-enemies', 'avoid-mech'],
+    'scan': [{'coordinates': {'x': 0, 'y': 1}, 'enemies': {'type': 'mech', 'number': 1}}, {'coordinates': {'x': 0, 'y': 10}, 'enemies': {'type': 'soldier', 'number': 10}}],  # noqa: E501
+}
+REORDERED_REQUEST = {
+    'scan': [{'enemies': {'number': 1, 'type': 'mech'}, 'coordinates': {'y': 1, 'x': 0}}, {'enemies': {'number': 10, 'type': 'soldier'}, 'coordinates': {'y': 10, 'x': 0}}],  # noqa: E501
+    'protocols': ['avoid-mech', 'closest-enemies', 'avoid-mech'],
+}
+
+
+def key_of(data):
+    request = RadarRequest.parse_obj(data)
+    return request_key(compile_protocols(request.protocols), request.scan)
+
+
+def test_request_key_is_canonical():
+    assert key_of(RADAR_REQUEST) == key_of(REORDERED_REQUEST)
+    assert key_of(RADAR_REQUEST) != key_of({**RADAR_REQUEST, 'protocols': ['furthest-enemies', 'avoid-mech']})
+    assert key_of(RADAR_REQUEST) != key_of({**RADAR_REQUEST, 'scan': RADAR_REQUEST['scan'][::-1]})
+
+
+def test_in_memory_backend_evicts_and_expires():
+    now = [0.0]
+    backend = InMemoryCacheBackend(max_entries=2, ttl=10, clock=lambda: now[0])
+    backend.set('a', b'1')
+    backend.set('b', b'2')
+    assert backend.get('a') == b'1'
+    backend.set('c', b'3')
+
+    assert backend.get('b') is None
+    assert backend.stats() == {'entries': 2, 'evictions': 1, 'expirations': 0}
+
+    now[0] = 10
+    assert backend.get('a') is None
+    assert backend.stats() == {'entries': 1, 'evictions': 1, 'expirations': 1}
+
+
+@pytest.mark.parametrize('request_data,expected_coordinates', load_test_cases())
+def test_result_cache_matches_test_cases(request_data, expected_coordinates):
+    cache = ResultCache(InMemoryCacheBackend(max_entries=10, ttl=60))
+    plan = compile_protocols(request_data.protocols)
+
+    assert cache.find_next_coordinates(plan, request_data.scan).dict() == expected_coordinates
+    assert cache.find_next_coordinates(plan, request_data.scan).dict() == expected_coordinates
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_cache_stores_no_target_outcome():
+    cache = ResultCache(InMemoryCacheBackend(max_entries=10, ttl=60))
+    request = RadarRequest.parse_obj({**RADAR_REQUEST, 'protocols': ['prioritize-mech', 'avoid-mech']})
+    plan = compile_protocols(request.protocols)
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match='No valid targets found'):
+            cache.find_next_coordinates(plan, request.scan)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_radar_endpoint_uses_result_cache(monkeypatch):
+    monkeypatch.setattr(settings, 'result_cache_enabled', True)
+    hits = result_cache.hits
+
+    assert client.post('/radar', json=RADAR_REQUEST).json() == {'x': 0, 'y': 10}
+    assert client.post('/radar', json=REORDERED_REQUEST).json() == {'x': 0, 'y': 10}
+    assert result_cache.hits >= hits + 1
+    assert 'radar_result_cache_hits_total' in client.get('/metrics').text
@@ -0,0 +1,196 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, metrics, sharding
+from app.calibration import calibrate_engines, start_calibration, stop_calibration
+from app.config import settings
+from app.main import app
+from app.schemas import ScanData
+from app.services import (
+    CostModel,
+    RadarSystem,
+    compile_protocols,
+    engine_dispatcher,
+    filter_statistics,
+    plan_cache_info,
+)
+from app.synthetic import generate_scan
+
+client = TestClient(app)
+
+SCAN = [ScanData.parse_obj(point) for point in generate_scan(500, seed=3)]
+MODEL = CostModel({
+    'python': (1e-6, 1e-6, 0.0, 0.0),
+    'vectorized': (1e-4, 1e-7, 0.0, 0.0),
+})
+
+
+@pytest.fixture
+def cost_model(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', MODEL)
+
+
+def test_cost_model_fit_recovers_coefficients():
+    fixed, per_target, per_filter, per_sort = coefficients = (2e-5, 1e-7, 3e-8, 5e-8)
+    samples = [
+        (size, filters, sorts, fixed + size * (per_target + filters * per_filter + sorts * per_sort))
+        for size in (10, 100, 1_000) for filters, sorts in ((1, 0), (2, 1), (3, 1), (2, 2))
+    ]
+
+    model = CostModel.fit({'python': samples})
+
+    assert model.coefficients['python'] == pytest.approx(coefficients)
+    assert model.predict('python', 50, 2, 1) == pytest.approx(2e-5 + 50 * (1e-7 + 6e-8 + 5e-8))
+    assert model.predict('parallel', 50, 2, 1) == float('inf')
+
+
+def test_dispatcher_without_model_keeps_sequential_engines():
+    assert engine_dispatcher.choose(10, 2, 1) == 'python'
+    assert engine_dispatcher.choose(10, 2, 1, vectorized=True) == 'vectorized'
+
+
+def test_dispatcher_picks_cheapest_strategy(cost_model):
+    assert engine_dispatcher.choose(10, 2, 1) == 'python'
+    assert engine_dispatcher.choose(1_000, 2, 1) == 'vectorized'
+    assert engine_dispatcher.choose(1_000, 2, 1, parallel=False) == 'vectorized'
+
+
+def test_forced_strategy(monkeypatch, cost_model):
+    monkeypatch.setattr(settings, 'engine_strategy', 'vectorized')
+    assert engine_dispatcher.choose(10, 2, 1) == 'vectorized'
+
+    monkeypatch.setattr(settings, 'engine_strategy', 'parallel')
+    monkeypatch.setattr(sharding, 'batch_workers', lambda: 2)
+    assert engine_dispatcher.choose(10, 2, 1) == 'parallel'
+    assert engine_dispatcher.choose(10, 2, 1, parallel=False) == 'python'
+
+    # Without a process pool to shard on, a forced parallel strategy falls back to the cost model.
+    monkeypatch.setattr(sharding, 'batch_workers', lambda: 1)
+    assert engine_dispatcher.choose(10, 2, 1) == 'python'
+
+
+@pytest.mark.parametrize('protocols', [['avoid-mech', 'closest-enemies'], ['avoid-crossfire', 'assist-allies']])
+def test_strategies_return_the_same_target(monkeypatch, protocols):
+    plan = compile_protocols(protocols)
+    expected = RadarSystem(protocols).find_top_targets(SCAN, 5)
+
+    for strategy in ('python', 'vectorized'):
+        assert plan.find_top_targets(SCAN, 5, strategy=strategy) == expected
+        monkeypatch.setattr(settings, 'engine_strategy', strategy)
+        assert plan.find_next_target(SCAN) == expected[0]
+        assert RadarSystem(protocols).find_next_target(SCAN) == expected[0]
+        assert engine_dispatcher.last == strategy
+
+
+def test_dispatched_requests_are_recorded(cost_model):
+    runs = metrics.engine_strategy_total.value(('vectorized',))
+
+    compile_protocols(['closest-enemies']).find_next_target(SCAN)
+
+    assert engine_dispatcher.last == 'vectorized'
+    assert metrics.engine_strategy_total.value(('vectorized',)) == runs + 1
+
+
+def test_calibrate_engines(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', None)
+
+    model = calibrate_engines(sizes=(8, 64), parallel_sizes=None, repeat=1)
+
+    assert engine_dispatcher.model is model
+    assert set(model.coefficients) == {'python', 'vectorized'}
+    assert all(value >= 0 for coefficients in model.coefficients.values() for value in coefficients)
+
+
+def test_calibration_leaves_no_production_state(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', None)
+    statistics = filter_statistics.snapshot()
+    evaluated = metrics.filter_evaluated_total.value(('DistanceFilter',))
+    cache = plan_cache_info()
+
+    calibrate_engines(sizes=(8, 64), parallel_sizes=None, repeat=1)
+
+    assert filter_statistics.snapshot() == statistics
+    assert metrics.filter_evaluated_total.value(('DistanceFilter',)) == evaluated
+    assert (plan_cache_info().hits, plan_cache_info().misses) == (cache.hits, cache.misses)
+
+
+def test_calibration_respects_its_budget(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', None)
+
+    assert calibrate_engines(sizes=(8, 64), parallel_sizes=None, repeat=1, budget=0).coefficients == {}
+    assert engine_dispatcher.choose(10, 2, 1) == 'python'
+
+
+def test_calibration_runs_after_readiness(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', None)
+    monkeypatch.setattr(settings, 'engine_calibration', True)
+    monkeypatch.setattr(settings, 'engine_calibration_budget', 0.5)
+    monkeypatch.setattr(settings, 'parallel_scan_threshold', 0)
+    readiness = []
+    monkeypatch.setattr(main, 'start_calibration', lambda: readiness.append(app.state.ready))
+
+    with TestClient(app):
+        pass
+    assert readiness == [True]
+
+    start_calibration().join()
+    assert engine_dispatcher.model is not None
+    stop_calibration()
+    assert engine_dispatcher.model is None
+
+
+def test_shutdown_stops_calibration(monkeypatch):
+    monkeypatch.setattr(engine_dispatcher, 'model', None)
+    monkeypatch.setattr(settings, 'engine_calibration', True)
+    monkeypatch.setattr(settings, 'engine_calibration_budget', 60.0)
+    monkeypatch.setattr(settings, 'parallel_scan_threshold', 0)
+
+    threads = []
+    monkeypatch.setattr(main, 'start_calibration', lambda: threads.append(start_calibration()))
+
+    with TestClient(app):
+        pass
+    assert not threads[0].is_alive()
+    assert engine_dispatcher.model is None
+
+
+@pytest.mark.parametrize('coordinate', [2 ** 32, 2 ** 70])
+def test_radar_with_huge_coordinates_on_every_strategy(monkeypatch, coordinate):
+    near = {'coordinates': {'x': 50, 'y': 0}, 'enemies': {'type': 'soldier', 'number': 1}}
+    far = {'coordinates': {'x': coordinate, 'y': 0}, 'enemies': {'type': 'soldier', 'number': 1}}
+    request = {'protocols': ['closest-enemies'], 'scan': [far] + [near] * 3_000}
+
+    for strategy in ('python', 'vectorized'):
+        monkeypatch.setattr(settings, 'engine_strategy', strategy)
+        response = client.post('/radar', json=request)
+        assert (response.status_code, response.json()) == (200, {'x': 50, 'y': 0})
+
+
+@pytest.mark.parametrize('allies,expected', [(2 ** 63, {'x': 0, 'y': 20}), (-2 ** 63, {'x': 0, 'y': 10})])
+def test_radar_with_huge_allies_on_every_strategy(monkeypatch, allies, expected):
+    def point(y, point_allies):
+        return {'coordinates': {'x': 0, 'y': y}, 'enemies': {'type': 'soldier', 'number': 1}, 'allies': point_allies}
+
+    scan = [point(10, -5), point(20, allies)] + [point(30, -6)] * 5_000
+    request = {'protocols': ['assist-allies'], 'scan': scan}
+
+    for strategy in ('python', 'vectorized'):
+        monkeypatch.setattr(settings, 'engine_strategy', strategy)
+        response = client.post('/radar', json=request)
+        assert (response.status_code, response.json()) == (200, expected)
+        assert RadarSystem(['assist-allies'], vectorized=True).find_top_targets(
+            [ScanData.parse_obj(p) for p in scan[:3]], 1
+        )[0].coordinates.dict() == expected
+
+
+def test_radar_engines_endpoint(cost_model):
+    scan = [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}}]
+    client.post('/radar', json={'protocols': ['closest-enemies'], 'scan': scan})
+    response = client.get('/radar/engines')
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['calibrated'] is True
+    assert body['forced'] is None
+    assert body['last'] == 'python'
+    assert body['runs']['python'] >= 1
@@ -0,0 +1,114 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.capture import NO_TARGET_ERROR, CaptureLog, CaptureMiddleware, read_capture_log
+from app.main import app
+from app.packed import PACKED_SCAN_MEDIA_TYPE, encode_radar_request
+from app.schemas import RadarRequest
+from benchmarks.replay import ENGINES, replay
+
+RADAR_REQUEST = {
+    'protocols': ['closest-enemies'],
+    'scan': [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}, 'allies': None}],
+}
+
+
+def test_capture_log_appends_gzip_members(tmp_path):
+    path = str(tmp_path / 'capture.log.gz')
+    log = CaptureLog(path, flush_records=2)
+
+    assert not log.append({'record': 0})
+    assert log.append({'record': 1})
+    log.flush()
+    log.append({'record': 2})
+    log.flush()
+    log.flush()
+
+    with open(path, 'rb') as log_file:
+        assert log_file.read().count(b'\x1f\x8b') == 2
+    assert [record['record'] for record in read_capture_log(path)] == [0, 1, 2]
+    with gzip.open(path) as log_file:
+        assert len(log_file.read().splitlines()) == 3
+
+
+def test_capture_middleware_records_answered_requests(tmp_path):
+    path = str(tmp_path / 'capture.log.gz')
+    log = CaptureLog(path, flush_records=100)
+    client = TestClient(CaptureMiddleware(app, log, paths=['/radar'], sample_rate=1.0), raise_server_exceptions=False)
+
+    client.post('/radar', json=RADAR_REQUEST)
+    client.post('/radar', content=encode_radar_request(RadarRequest.parse_obj(RADAR_REQUEST)),
+                headers={'Content-Type': PACKED_SCAN_MEDIA_TYPE})
+    assert client.post('/radar', json={**RADAR_REQUEST, 'scan': []}).status_code == 500
+    assert client.post('/radar', json={}).status_code == 422
+    client.post('/radar/top', json=RADAR_REQUEST)
+    log.flush()
+
+    records = list(read_capture_log(path))
+    assert [record['format'] for record in records] == ['json', 'packed', 'json']
+    assert [record['result'] for record in records] == [{'x': 0, 'y': 40}, {'x': 0, 'y': 40}, None]
+    assert [record['status'] for record in records] == [200, 200, 500]
+    assert [record['error'] for record in records] == [None, None, NO_TARGET_ERROR]
+    assert records[0]['protocols'] == records[1]['protocols'] == RADAR_REQUEST['protocols']
+    assert records[0]['scan'] == records[1]['scan'] == RADAR_REQUEST['scan']
+    assert all(record['latency'] > 0 for record in records)
+
+
+def test_capture_middleware_records_crashes(tmp_path, monkeypatch):
+    def crash(protocols, targets):
+        raise OverflowError('int too big to convert')
+
+    monkeypatch.setattr(main, 'evaluate_radar', crash)
+    log = CaptureLog(str(tmp_path / 'capture.log.gz'))
+    client = TestClient(CaptureMiddleware(app, log, paths=['/radar'], sample_rate=1.0), raise_server_exceptions=False)
+
+    assert client.post('/radar', json=RADAR_REQUEST).status_code == 500
+    log.flush()
+
+    [record] = read_capture_log(log.path)
+    assert (record['status'], record['result']) == (500, None)
+    assert record['error'] == 'OverflowError: int too big to convert'
+
+
+def test_capture_middleware_skips_bodies_that_are_not_objects(tmp_path):
+    log = CaptureLog(str(tmp_path / 'capture.log.gz'))
+    client = TestClient(CaptureMiddleware(app, log, paths=['/radar', '/radar/batch'], sample_rate=1.0))
+
+    assert client.post('/radar', json=[RADAR_REQUEST]).status_code == 422
+    assert client.post('/radar/batch', json=[RADAR_REQUEST]).status_code == 200
+    assert client.post('/radar/batch', json=[]).status_code == 200
+    client.post('/radar', json=RADAR_REQUEST)
+    log.flush()
+
+    assert [record['result'] for record in read_capture_log(log.path)] == [{'x': 0, 'y': 40}]
+
+
+def test_capture_middleware_samples(tmp_path):
+    log = CaptureLog(str(tmp_path / 'capture.log.gz'))
+    client = TestClient(CaptureMiddleware(app, log, paths=['/radar'], sample_rate=0.0))
+
+    client.post('/radar', json=RADAR_REQUEST)
+    assert not log.append({})
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / 'capture.log.gz')
+    log = CaptureLog(path)
+    log.append({**RADAR_REQUEST, 'result': {'x': 0, 'y': 40}, 'latency': 0.001})
+    log.append({**RADAR_REQUEST, 'scan': [], 'result': None, 'latency': 0.001})
+    log.append({**RADAR_REQUEST, 'result': {'x': 1, 'y': 1}, 'latency': 0.001})
+    log.append({**RADAR_REQUEST, 'status': 500, 'result': None, 'error': NO_TARGET_ERROR, 'latency': 0.001})
+    log.append({**RADAR_REQUEST, 'status': 500, 'result': None, 'error': 'OverflowError: too big', 'latency': 0.001})
+    log.flush()
+
+    for engine in ['radar-system', 'auto', 'python', 'vectorized']:
+        summary = replay(read_capture_log(path), ENGINES[engine], repeat=2, slowest=2)
+        assert summary['records'] == 4
+        assert summary['mismatches'] == [
+            {'record': 2, 'expected': {'x': 1, 'y': 1}, 'actual': {'x': 0, 'y': 40}},
+            {'record': 3, 'expected': None, 'actual': {'x': 0, 'y': 40}},
+        ]
+        assert summary['errors'] == [{'record': 4, 'status': 500, 'error': 'OverflowError: too big'}]
+        assert len(summary['slowest']) == 2
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import executor as executor_module
+from app import sharding
+from app.batch import is_pool_worker
+from app.config import settings
+from app.executor import (
+    ExecutorBusyError,
+    RadarExecutor,
+    evaluate_radar,
+    radar_executor,
+)
+from app.limits import BodySizeLimitMiddleware
+from app.main import app
+from app.tests.cases import load_test_cases
+
+client = TestClient(app, raise_server_exceptions=False)
+
+RADAR_REQUEST = {
+    'protocols': ['closest-enemies'],
+    'scan': [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}}],
+}
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_executor_matches_inline_evaluation(kind):
+    executor = RadarExecutor(kind, max_workers=2, max_queue=4, inline_max_scan=0)
+    try:
+        for request, expected in load_test_cases()[:5]:
+            protocols = tuple(request.protocols)
+            coordinates = asyncio.run(executor.run(len(request.scan), evaluate_radar, protocols, request.scan))
+            assert coordinates.dict() == expected
+    finally:
+        executor.shutdown()
+
+
+def test_process_executor_workers_do_not_shard(monkeypatch):
+    monkeypatch.setattr(settings, 'batch_workers', 4)
+    executor = RadarExecutor('process', max_workers=1, max_queue=4, inline_max_scan=0)
+    try:
+        assert sharding.can_shard()
+        assert asyncio.run(executor.run(1, is_pool_worker)) is True
+        assert asyncio.run(executor.run(1, sharding.can_shard)) is False
+    finally:
+        executor.shutdown()
+
+
+def test_executor_runs_small_scans_inline():
+    executor = RadarExecutor('thread', max_workers=1, max_queue=0, inline_max_scan=10)
+    executor.pending = 1
+    assert asyncio.run(executor.run(10, sum, [1, 2])) == 3
+    assert executor._executor is None
+    with pytest.raises(ExecutorBusyError):
+        asyncio.run(executor.run(11, sum, [1, 2]))
+
+
+def test_radar_offloads_large_scans(monkeypatch):
+    monkeypatch.setattr(radar_executor, 'inline_max_scan', 0)
+    for request, expected in load_test_cases()[:5]:
+        response = client.post('/radar', content=request.json(), headers={'Content-Type': 'application/json'})
+        assert response.status_code == 200
+        assert response.json() == expected
+
+
+def test_radar_rejects_when_executor_is_full(monkeypatch):
+    monkeypatch.setattr(radar_executor, 'inline_max_scan', 0)
+    monkeypatch.setattr(radar_executor, 'pending', radar_executor.max_workers + radar_executor.max_queue)
+    response = client.post('/radar', json=RADAR_REQUEST)
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == str(settings.executor_retry_after)
+    response = client.post('/radar/top', json=RADAR_REQUEST)
+    assert response.status_code == 503
+
+
+def test_small_batches_and_sessions_are_rejected_when_executor_is_full(monkeypatch):
+    session_id = client.post('/sessions').json()['session_id']
+    point = {'id': 'a', **RADAR_REQUEST['scan'][0]}
+    client.patch(f'/sessions/{session_id}/scan', json={'add': [point]})
+    monkeypatch.setattr(radar_executor, 'inline_max_scan', 0)
+    monkeypatch.setattr(radar_executor, 'pending', radar_executor.max_workers + radar_executor.max_queue)
+
+    response = client.post('/radar/batch', json=[RADAR_REQUEST])
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == str(settings.executor_retry_after)
+    response = client.post(f'/sessions/{session_id}/radar', json={'protocols': ['closest-enemies']})
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_small_batches_and_sessions_run_in_executor(monkeypatch, kind):
+    executor = RadarExecutor(kind, max_workers=1, max_queue=4, inline_max_scan=0)
+    monkeypatch.setattr(executor_module, 'radar_executor', executor)
+    session_id, empty_session_id = (client.post('/sessions').json()['session_id'] for _ in range(2))
+    point = {'id': 'a', **RADAR_REQUEST['scan'][0]}
+    client.patch(f'/sessions/{session_id}/scan', json={'add': [point]})
+    try:
+        assert client.post('/radar/batch', json=[RADAR_REQUEST, {**RADAR_REQUEST, 'scan': []}]).json() == [
+            {'x': 0, 'y': 40}, {'detail': 'No valid targets found'},
+        ]
+        response = client.post(f'/sessions/{session_id}/radar', json={'protocols': ['closest-enemies']})
+        assert response.json() == {'x': 0, 'y': 40}
+        response = client.post(f'/sessions/{empty_session_id}/radar', json={'protocols': ['closest-enemies']})
+        assert response.status_code == 404
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.parametrize('path', ['/radar', '/radar/top'])
+def test_radar_rejects_large_scans(monkeypatch, path):
+    monkeypatch.setattr(settings, 'max_scan_size', 1)
+    assert client.post(path, json=RADAR_REQUEST).status_code == 200
+    response = client.post(path, json={**RADAR_REQUEST, 'scan': RADAR_REQUEST['scan'] * 2})
+    assert response.status_code == 413
+
+
+def test_radar_batch_limits_total_scan_size(monkeypatch):
+    monkeypatch.setattr(settings, 'max_scan_size', 1)
+    assert client.post('/radar/batch', json=[RADAR_REQUEST]).status_code == 200
+    assert client.post('/radar/batch', json=[RADAR_REQUEST, RADAR_REQUEST]).status_code == 413
+
+
+def body_limited_client():
+    limited_app = FastAPI()
+
+    @limited_app.post('/echo')
+    async def echo(request: Request) -> int:
+        return len(await request.body())
+
+    @limited_app.post('/stream')
+    async def stream(request: Request) -> int:
+        return len(await request.body())
+
+    limited_app.add_middleware(BodySizeLimitMiddleware, max_body_size=10, exclude_paths=['/stream'])
+    return TestClient(limited_app)
+
+
+def test_body_size_limit():
+    limited_client = body_limited_client()
+    assert limited_client.post('/echo', content=b'x' * 10).json() == 10
+    assert limited_client.post('/echo', content=b'x' * 11).status_code == 413
+    assert limited_client.post('/stream', content=b'x' * 11).json() == 11
+
+
+def test_body_size_limit_without_content_length():
+    limited_client = body_limited_client()
+    response = limited_client.post('/echo', content=iter([b'x' * 6, b'x' * 6]))
+    assert response.status_code == 413
+    assert response.json() == {'detail': 'Request body too large'}
@@ -0,0 +1,103 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.fastjson import (
+    FastCoordinates,
+    FastRadarRoute,
+    decode_radar_request,
+    encode_record,
+)
+from app.main import app, radar
+from app.schemas import Coordinates
+from app.tests.cases import load_raw_test_cases
+
+fast_app = FastAPI()
+fast_app.router.add_api_route(
+    '/radar', radar, methods=['POST'], response_model=Coordinates, route_class_override=FastRadarRoute
+)
+
+client = TestClient(app)
+fast_client = TestClient(fast_app, raise_server_exceptions=False)
+
+
+def test_decode_radar_request():
+    radar_request = decode_radar_request(
+        b'{"protocols":["avoid-mech"],"scan":[{"coordinates":{"x":0,"y":40},"allies":3,'
+        b'"enemies":{"type":"soldier","number":10}},'
+        b'{"enemies":{"type":"mech","number":1},"coordinates":{"y":1,"x":2}}]}'
+    )
+
+    assert radar_request.protocols == ['avoid-mech']
+    assert [(t.coordinates.x, t.coordinates.y, t.enemies.type, t.enemies.number, t.allies)
+            for t in radar_request.scan] == [(0, 40, 'soldier', 10, 3), (2, 1, 'mech', 1, None)]
+
+
+@pytest.mark.parametrize(
+    'body',
+    [
+        b'',
+        b'not json',
+        b'[]',
+        b'{"protocols":["unknown"],"scan":[]}',
+        b'{"protocols":[],"scan":{}}',
+        b'{"protocols":[],"scan":[1]}',
+        b'{"protocols":[],"scan":[{"coordinates":{"x":"1","y":2},"enemies":{"type":"mech","number":1}}]}',
+        b'{"protocols":[],"scan":[{"coordinates":{"x":1.0,"y":2},"enemies":{"type":"mech","number":1}}]}',
+        b'{"protocols":[],"scan":[{"coordinates":{"x":true,"y":2},"enemies":{"type":"mech","number":1}}]}',
+        b'{"protocols":[],"scan":[{"coordinates":{"x":1,"y":2},"enemies":{"type":"mech"}}]}',
+        b'{"protocols":[],"scan":[{"coordinates":{"x":1,"y":2},"enemies":{"type":"mech","number":1},"allies":"2"}]}',
+    ],
+)
+def test_decode_radar_request_rejects_non_canonical_bodies(body):
+    assert decode_radar_request(body) is None
+
+
+def test_encode_record():
+    assert encode_record(FastCoordinates(0, 40)) == b'{"x":0,"y":40}'
+
+
+@pytest.mark.parametrize('body', load_raw_test_cases())
+def test_fast_route_is_byte_identical(body):
+    response = client.post('/radar', content=body, headers={'Content-Type': 'application/json'})
+    fast_response = fast_client.post('/radar', content=body, headers={'Content-Type': 'application/json'})
+
+    assert fast_response.status_code == response.status_code == 200
+    assert fast_response.content == response.content
+    assert fast_response.headers['content-type'] == response.headers['content-type']
+
+
+@pytest.mark.parametrize(
+    'body,headers',
+    [
+        (b'', {'Content-Type': 'application/json'}),
+        (b'{"protocols":', {'Content-Type': 'application/json'}),
+        (b'{"protocols":["unknown"],"scan":[]}', {'Content-Type': 'application/json'}),
+        (b'{"protocols":[],"scan":[{"coordinates":{"x":"a","y":2},"enemies":{"type":"mech","number":1}}]}', {}),
+        (b'{"protocols":[],"scan":[]}', {'Content-Type': 'text/plain'}),
+    ],
+)
+def test_fast_route_keeps_validation_errors(body, headers):
+    response = client.post('/radar', content=body, headers=headers)
+    fast_response = fast_client.post('/radar', content=body, headers=headers)
+
+    assert fast_response.status_code == response.status_code == 422
+    assert fast_response.content == response.content
+
+
+def test_fast_route_falls_back_for_coerced_values():
+    body = b'{"protocols":[],"scan":[{"coordinates":{"x":"3","y":4},"enemies":{"type":"mech","number":1}}]}'
+    fast_response = fast_client.post('/radar', content=body, headers={'Content-Type': 'application/json'})
+
+    assert fast_response.status_code == 200
+    assert fast_response.json() == {'x': 3, 'y': 4}
+
+
+def test_fast_route_limits_scan_size(monkeypatch):
+    monkeypatch.setattr(settings, 'max_scan_size', 1)
+    point = b'{"coordinates":{"x":0,"y":4},"enemies":{"type":"mech","number":1}}'
+    body = b'{"protocols":[],"scan":[' + point + b',' + point + b']}'
+    fast_response = fast_client.post('/radar', content=body, headers={'Content-Type': 'application/json'})
+
+    assert fast_response.status_code == 413
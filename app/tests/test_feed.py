@@ -0,0 +1,113 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import feed
+from app.feed import FeedConnection
+from app.main import app
+from app.services import compile_protocols
+from app.tests.cases import load_test_cases
+
+client = TestClient(app)
+
+SCAN = [
+    {'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}},
+    {'coordinates': {'x': 0, 'y': 20}, 'enemies': {'type': 'mech', 'number': 1}},
+]
+
+
+def test_feed_answers_every_frame():
+    with client.websocket_connect('/radar/feed') as websocket:
+        websocket.send_json({'protocols': ['avoid-mech', 'closest-enemies', 'closest-enemies']})
+        assert websocket.receive_json() == {'type': 'subscribed', 'protocols': ['avoid-mech', 'closest-enemies']}
+
+        websocket.send_json({'seq': 1, 'scan': SCAN})
+        assert websocket.receive_json() == {'type': 'target', 'seq': 1, 'target': {'x': 0, 'y': 40}, 'dropped': 0}
+
+        websocket.send_json({'seq': 2, 'scan': SCAN[1:]})
+        assert websocket.receive_json() == {'type': 'no_target', 'seq': 2, 'dropped': 0}
+
+        websocket.send_text('{"seq": 3, "scan": [{"coordinates": {"x": "5", "y": 0}, "enemies": {"type": "soldier", '
+                            '"number": 1}}]}')
+        assert websocket.receive_json()['target'] == {'x': 5, 'y': 0}
+
+        websocket.send_json({'seq': 4, 'scan': [{'coordinates': {}}]})
+        reply = websocket.receive_json()
+        assert reply['type'] == 'error' and reply['seq'] == 4
+
+        websocket.send_text('not json')
+        assert websocket.receive_json()['type'] == 'error'
+
+
+def test_feed_survives_evaluation_errors(monkeypatch):
+    find_next_coordinates = feed._find_next_coordinates
+    calls = []
+
+    def crash_once(plan, targets):
+        calls.append(len(targets))
+        if len(calls) == 1:
+            raise OverflowError('int too big to convert')
+        return find_next_coordinates(plan, targets)
+
+    monkeypatch.setattr(feed, '_find_next_coordinates', crash_once)
+    with client.websocket_connect('/radar/feed') as websocket:
+        websocket.send_json({'protocols': ['closest-enemies']})
+        websocket.receive_json()
+
+        websocket.send_json({'seq': 1, 'scan': SCAN})
+        assert websocket.receive_json() == {
+            'type': 'error', 'seq': 1, 'detail': 'Radar failed to evaluate the frame', 'dropped': 0,
+        }
+        websocket.send_json({'seq': 2, 'scan': SCAN})
+        assert websocket.receive_json() == {'type': 'target', 'seq': 2, 'target': {'x': 0, 'y': 20}, 'dropped': 0}
+
+
+def test_feed_matches_radar():
+    for request, expected in load_test_cases():
+        with client.websocket_connect('/radar/feed') as websocket:
+            websocket.send_text(orjson.dumps({'protocols': request.protocols}).decode())
+            websocket.receive_json()
+            websocket.send_text(orjson.dumps({'seq': 0, 'scan': [point.dict() for point in request.scan]}).decode())
+            assert websocket.receive_json()['target'] == expected
+
+
+def test_feed_rejects_invalid_protocols():
+    with client.websocket_connect('/radar/feed') as websocket:
+        websocket.send_json({'protocols': ['unknown']})
+        assert websocket.receive_json()['type'] == 'error'
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+
+class FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = [{'type': 'websocket.receive', 'text': orjson.dumps(frame).decode()} for frame in frames]
+        self.sent = []
+        self.idle = asyncio.Event()
+
+    async def receive(self):
+        if self.frames:
+            return self.frames.pop(0)
+        self.idle.set()
+        await asyncio.Event().wait()
+
+    async def send_text(self, text):
+        self.sent.append(orjson.loads(text))
+
+
+def test_feed_drops_stale_frames():
+    websocket = FakeWebSocket([{'seq': seq, 'scan': SCAN} for seq in range(5)])
+    connection = FeedConnection(websocket, compile_protocols(['closest-enemies']))
+
+    async def serve():
+        task = asyncio.create_task(connection.serve())
+        await websocket.idle.wait()
+        while not websocket.sent:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(serve())
+    assert websocket.sent == [{'type': 'target', 'seq': 4, 'target': {'x': 0, 'y': 20}, 'dropped': 4}]
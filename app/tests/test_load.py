@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+
+from app.main import app
+from benchmarks.load import (
+    LoadCase,
+    percentile,
+    recorded_cases,
+    run_load,
+    synthetic_cases,
+)
+
+
+async def run_in_process(cases, **kwargs):
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url='http://radar') as client:
+        return await run_load(client, cases, **kwargs)
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile(values, 1.0) == 100.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_run_load_replays_test_cases():
+    cases = recorded_cases() + synthetic_cases([20])
+    summary = asyncio.run(run_in_process(cases, concurrency=4, duration=30, max_requests=len(cases)))
+
+    assert summary['requests'] == len(cases)
+    assert summary['failures'] == 0
+    assert 0 < summary['latency']['p50'] <= summary['latency']['p99'] <= summary['latency']['max']
+
+
+def test_run_load_reports_wrong_answers():
+    case = recorded_cases()[0]
+    wrong_case = LoadCase(case.body, b'{"x":1,"y":1}')
+    summary = asyncio.run(run_in_process([case, wrong_case], concurrency=2, duration=30, max_requests=4))
+
+    assert summary['requests'] == 4
+    assert summary['failures'] == 2
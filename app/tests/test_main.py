@@ -111,3 +111,32 @@ def test_radar_endpoint(input_data: Dict, expected_coordinates: Dict):
     response = client.post('/radar', json=input_data)
     assert response.status_code == 200
     assert response.json() == expected_coordinates
+
+
+def test_radar_top_endpoint():
+    input_data = {
+        'protocols': ['closest-enemies', 'avoid-mech'],
+        'scan': [{'coordinates': {'x': 0, 'y': 1}, 'enemies': {'type': 'mech', 'number': 1}}, {'coordinates': {'x': 0, 'y': 10}, 'enemies': {'type': 'soldier', 'number': 10}}, {'coordinates': {'x': 0, 'y': 99}, 'enemies': {'type': 'soldier', 'number': 1}}, {'coordinates': {'x': 0, 'y': 5}, 'enemies': {'type': 'soldier', 'number': 1}}],  # noqa: E501
+    }
+    response = client.post('/radar/top', params={'k': 2}, json=input_data)
+    assert response.status_code == 200
+    assert response.json() == [{'x': 0, 'y': 5}, {'x': 0, 'y': 10}]
+
+    response = client.post('/radar/top', json=input_data)
+    assert response.status_code == 200
+    assert response.json() == [{'x': 0, 'y': 5}]
+
+
+def test_radar_top_endpoint_no_valid_targets():
+    input_data = {
+        'protocols': ['avoid-crossfire'],
+        'scan': [{'coordinates': {'x': 0, 'y': 40}, 'allies': 2, 'enemies': {'type': 'soldier', 'number': 10}}],
+    }
+    response = client.post('/radar/top', params={'k': 3}, json=input_data)
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_radar_top_endpoint_invalid_k():
+    response = client.post('/radar/top', params={'k': 0}, json={'protocols': [], 'scan': []})
+    assert response.status_code == 422
@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+from app.metrics import Counter, Histogram, scan_size_bucket
+from app.services import filter_statistics
+
+client = TestClient(app)
+
+RADAR_REQUEST = {
+    'protocols': ['avoid-mech', 'closest-enemies'],
+    'scan': [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}}, {'coordinates': {'x': 0, 'y': 80}, 'allies': 5, 'enemies': {'type': 'mech', 'number': 1}}, {'coordinates': {'x': 0, 'y': 180}, 'enemies': {'type': 'soldier', 'number': 1}}],  # noqa: E501
+}
+STAGE_LABELS = ('avoid-mech,closest-enemies', '10')
+
+
+def test_histogram_render():
+    histogram = Histogram('latency_seconds', 'Latency.', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(('parse',), 0.05)
+    histogram.observe(('parse',), 0.5)
+    histogram.observe(('parse',), 5)
+
+    assert histogram.render() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{stage="parse",le="0.1"} 1',
+        'latency_seconds_bucket{stage="parse",le="1.0"} 2',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'latency_seconds_sum{stage="parse"} 5.55',
+        'latency_seconds_count{stage="parse"} 3',
+    ]
+
+
+def test_counter_render_escapes_labels():
+    counter = Counter('events_total', 'Events.', ('name',))
+    counter.inc(('a"b',), 2)
+
+    assert counter.render()[-1] == 'events_total{name="a\\"b"} 2'
+
+
+@pytest.mark.parametrize('size,expected', [(None, 'unknown'), (0, '10'), (10, '10'), (11, '100'), (10 ** 7, '+Inf')])
+def test_scan_size_bucket(size, expected):
+    assert scan_size_bucket(size) == expected
+
+
+def test_radar_records_stages_and_filter_rejections():
+    # Without statistics the filters run in their declared order, distance first.
+    filter_statistics.reset()
+    stages = ('receive', 'parse', 'validate', 'plan', 'filter', 'sort', 'endpoint', 'serialize')
+    counts = {stage: metrics.stage_seconds.count((stage,) + STAGE_LABELS) for stage in stages}
+    rejected = metrics.filter_rejected_total.value(('MechFilter',))
+    evaluated = metrics.filter_evaluated_total.value(('MechFilter',))
+
+    response = client.post('/radar', json=RADAR_REQUEST)
+
+    assert response.json() == {'x': 0, 'y': 40}
+    for stage in stages:
+        assert metrics.stage_seconds.count((stage,) + STAGE_LABELS) == counts[stage] + 1
+    assert metrics.filter_evaluated_total.value(('MechFilter',)) == evaluated + 2
+    assert metrics.filter_rejected_total.value(('MechFilter',)) == rejected + 1
+
+
+def test_metrics_endpoint():
+    client.post('/radar', json=RADAR_REQUEST)
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'radar_stage_seconds_count{stage="filter",protocols="avoid-mech,closest-enemies",scan_size="10"}' in response.text  # noqa: E501
+    assert 'radar_filter_rejected_total{filter="DistanceFilter"}' in response.text
+    assert 'radar_plan_cache_hits_total' in response.text
+
+
+def test_metrics_disabled(monkeypatch):
+    monkeypatch.setattr(metrics.registry, 'enabled', False)
+    count = metrics.stage_seconds.count(('filter',) + STAGE_LABELS)
+    evaluated = metrics.filter_evaluated_total.value(('MechFilter',))
+
+    assert client.post('/radar', json=RADAR_REQUEST).json() == {'x': 0, 'y': 40}
+    assert metrics.stage_seconds.count(('filter',) + STAGE_LABELS) == count
+    assert metrics.filter_evaluated_total.value(('MechFilter',)) == evaluated
+
+
+def test_radar_filters_endpoint():
+    client.post('/radar', json=RADAR_REQUEST)
+    response = client.get('/radar/filters')
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['adaptive'] is True
+    assert body['filters']['MechFilter']['evaluated'] > 0
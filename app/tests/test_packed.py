@@ -0,0 +1,113 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.executor import radar_executor
+from app.main import app
+from app.packed import (
+    ALLIES_ABSENT,
+    HEADER,
+    PACKED_SCAN_MEDIA_TYPE,
+    PackedScanError,
+    decode_packed_scan,
+    encode_packed_scan,
+    encode_radar_request,
+    evaluate_packed_radar,
+)
+from app.schemas import RadarRequest
+from app.tests.cases import load_test_cases
+from benchmarks.scans import BASIC_PROTOCOL_MIXES, generate_request
+
+client = TestClient(app, raise_server_exceptions=False)
+PACKED_HEADERS = {'Content-Type': PACKED_SCAN_MEDIA_TYPE}
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def synthetic_requests():
+    return [
+        RadarRequest.parse_obj(generate_request(500, protocols, seed=seed))
+        for seed, protocols in enumerate(BASIC_PROTOCOL_MIXES)
+    ]
+
+
+@pytest.mark.parametrize('request_data', [request for request, _ in load_test_cases()] + synthetic_requests())
+def test_round_trip(request_data):
+    packed = encode_radar_request(request_data)
+    scan = decode_packed_scan(packed)
+
+    assert scan.to_radar_request() == request_data
+    assert encode_packed_scan(scan.protocols, request_data.scan) == packed
+
+
+def test_decode_does_not_copy():
+    request = RadarRequest.parse_obj(generate_request(10, ['closest-enemies'], seed=1))
+    packed = bytearray(encode_radar_request(request))
+    scan = decode_packed_scan(packed)
+    assert not scan.x.flags.owndata
+
+    packed[HEADER.size + 4:HEADER.size + 8] = (7).to_bytes(4, 'little', signed=True)
+    assert scan.x[0] == 7
+
+
+def test_allies_sentinel():
+    request = RadarRequest.parse_obj({
+        'protocols': ['assist-allies'],
+        'scan': [
+            {'coordinates': {'x': 0, 'y': 1}, 'enemies': {'type': 'soldier', 'number': 1}},
+            {'coordinates': {'x': 0, 'y': 2}, 'enemies': {'type': 'mech', 'number': 1}, 'allies': 0},
+        ],
+    })
+    scan = decode_packed_scan(encode_radar_request(request))
+    assert scan.allies.tolist() == [ALLIES_ABSENT, 0]
+    assert scan.columns().has_allies.tolist() == [False, True]
+
+    request.scan[0].allies = ALLIES_ABSENT
+    with pytest.raises(PackedScanError):
+        encode_radar_request(request)
+
+
+@pytest.mark.parametrize('request_data', [
+    {'protocols': [], 'scan': [{'coordinates': {'x': 0, 'y': 1}, 'enemies': {'type': 'tank', 'number': 1}}]},
+    {'protocols': [], 'scan': [{'coordinates': {'x': 2 ** 31, 'y': 1}, 'enemies': {'type': 'mech', 'number': 1}}]},
+])
+def test_encode_rejects_unrepresentable_requests(request_data):
+    with pytest.raises(PackedScanError):
+        encode_radar_request(RadarRequest.parse_obj(request_data))
+
+
+def test_decode_rejects_invalid_buffers():
+    request = RadarRequest.parse_obj(generate_request(3, ['avoid-mech'], seed=2))
+    packed = encode_radar_request(request)
+
+    for buffer in [b'', b'JSON' + packed[4:], packed[:-1], packed + b'\0']:
+        with pytest.raises(PackedScanError):
+            decode_packed_scan(buffer)
+    with pytest.raises(PackedScanError, match='protocol'):
+        decode_packed_scan(packed[:HEADER.size] + b'\x09' + packed[HEADER.size + 1:])
+    with pytest.raises(PackedScanError, match='enemy type'):
+        decode_packed_scan(packed[:-1] + b'\x02')
+
+
+@pytest.mark.parametrize('request_data', [request for request, _ in load_test_cases()] + synthetic_requests())
+def test_radar_endpoint_matches_json(request_data):
+    json_response = client.post('/radar', content=request_data.json(), headers=JSON_HEADERS)
+    packed_response = client.post('/radar', content=encode_radar_request(request_data), headers=PACKED_HEADERS)
+
+    assert packed_response.status_code == json_response.status_code
+    if json_response.status_code == 200:
+        assert packed_response.content == json_response.content
+
+
+def test_radar_endpoint_offloads_packed_scans(monkeypatch):
+    monkeypatch.setattr(radar_executor, 'inline_max_scan', 0)
+    for request_data in synthetic_requests():
+        packed_response = client.post('/radar', content=encode_radar_request(request_data), headers=PACKED_HEADERS)
+        if packed_response.status_code == 200:
+            assert packed_response.json() == evaluate_packed_radar(
+                decode_packed_scan(encode_radar_request(request_data))
+            ).dict()
+
+
+def test_radar_endpoint_rejects_invalid_packed_scans():
+    response = client.post('/radar', content=b'not a packed scan', headers=PACKED_HEADERS)
+    assert response.status_code == 422
+    assert response.json() == {'detail': 'Not a packed scan or unsupported version'}
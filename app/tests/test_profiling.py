@@ -0,0 +1,58 @@
+import marshal
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.executor import radar_executor
+from app.main import app, profiles
+from app.profiling import is_profiling
+
+client = TestClient(app, raise_server_exceptions=False)
+
+RADAR_REQUEST = {
+    'protocols': ['closest-enemies'],
+    'scan': [{'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}}],
+}
+
+
+def test_radar_is_profiled_on_demand():
+    response = client.post('/radar', json=RADAR_REQUEST)
+    assert 'x-radar-profile-id' not in response.headers
+
+    response = client.post('/radar', json=RADAR_REQUEST, headers={settings.profile_header: '1', 'X-Request-ID': 'abc'})
+    assert response.json() == {'x': 0, 'y': 40}
+    assert response.headers['x-radar-profile-id'] == 'abc'
+
+    report = client.get('/profiles/abc')
+    assert report.status_code == 200
+    assert 'find_next_target' in report.text
+
+    raw = client.get('/profiles/abc', params={'format': 'pstats'})
+    assert any(function == 'find_next_target' for _, _, function in marshal.loads(raw.content))
+
+
+def test_failed_requests_are_profiled():
+    headers = {settings.profile_header: 'true', 'X-Request-ID': 'failed'}
+    response = client.post('/radar', json={**RADAR_REQUEST, 'scan': []}, headers=headers)
+
+    assert response.status_code == 500
+    assert profiles.get('failed') is not None
+
+
+def test_profiled_requests_run_inline(monkeypatch):
+    calls = []
+
+    def spy(*args):
+        calls.append(is_profiling())
+        raise AssertionError('not inline')
+
+    monkeypatch.setattr(radar_executor, 'inline_max_scan', 0)
+    monkeypatch.setattr(radar_executor, '_get_executor', spy)
+    response = client.post('/radar', json=RADAR_REQUEST, headers={settings.profile_header: '1'})
+    assert response.status_code == 200
+    assert not calls
+
+
+def test_unknown_profile():
+    assert client.get('/profiles/unknown').status_code == 404
+    assert client.get('/profiles/unknown', params={'format': 'pstats'}).status_code == 404
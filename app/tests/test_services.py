@@ -1,16 +1,27 @@
+import dataclasses
+
+import numpy as np
 import pytest
 
-from app.schemas import Coordinates, Enemies, ScanData
+from app.config import settings
+from app.schemas import Coordinates, Enemies, RadarRequest, ScanData
 from app.services import (
     AlliesSort,
     ClosestEnemiesSort,
     CrossfireFilter,
     DistanceFilter,
+    FilterStatistics,
     FurthestEnemiesSort,
     MechFilter,
     PrioritizeMechFilter,
     RadarSystem,
+    ScanColumns,
+    compile_protocols,
+    filter_statistics,
+    normalize_protocols,
+    plan_cache_info,
 )
+from app.tests.cases import load_test_cases
 
 
 # Test cases for DistanceFilter
@@ -184,3 +195,197 @@ def test_radar_system_find_next_target_no_valid_targets():
 
     with pytest.raises(ValueError, match='No valid targets found'):
         radar_system.find_next_target(targets)
+
+
+# Test cases for the vectorized engine
+def test_scan_columns():
+    sd1 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='mech', number=1), allies=2)
+    sd2 = ScanData(coordinates=Coordinates(x=5, y=12), enemies=Enemies(type='infantry', number=1), allies=None)
+    columns = ScanColumns([sd1, sd2])
+
+    assert len(columns) == 2
+    assert columns.squared_distance.tolist() == [25, 169]
+    assert columns.distance.tolist() == [5.0, 13.0]
+    assert columns.is_mech.tolist() == [True, False]
+    assert columns.has_allies.tolist() == [True, False]
+    assert columns.allies.tolist() == [2, 0]
+
+
+def test_radar_system_vectorized_keeps_stable_ties():
+    protocols = ['closest-enemies', 'assist-allies']
+    sd1 = ScanData(coordinates=Coordinates(x=4, y=3), enemies=Enemies(type='soldier', number=1), allies=1)
+    sd2 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd3 = ScanData(coordinates=Coordinates(x=0, y=5), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd4 = ScanData(coordinates=Coordinates(x=1, y=1), enemies=Enemies(type='soldier', number=1), allies=1)
+    targets = [sd1, sd2, sd3, sd4]
+
+    assert RadarSystem(protocols, vectorized=True).find_next_target(targets) == sd2
+    assert RadarSystem(protocols).find_next_target(targets) == sd2
+
+
+@pytest.mark.parametrize('coordinate', [2 ** 32, -2 ** 32, 2 ** 31, 2 ** 70, -2 ** 70])
+def test_vectorized_engine_rejects_huge_coordinates(coordinate):
+    protocols = ['closest-enemies']
+    far = ScanData(coordinates=Coordinates(x=coordinate, y=0), enemies=Enemies(type='soldier', number=1))
+    near = ScanData(coordinates=Coordinates(x=50, y=0), enemies=Enemies(type='soldier', number=1))
+
+    assert RadarSystem(protocols, vectorized=True).find_next_target([far, near]) == near
+    assert compile_protocols(protocols).find_next_target([far, near], vectorized=True) == near
+    with pytest.raises(ValueError, match='No valid targets found'):
+        RadarSystem(protocols, vectorized=True).find_next_target([far])
+
+
+def test_scan_columns_from_int32_arrays_do_not_overflow():
+    x = np.array([np.iinfo(np.int32).min, 3], dtype=np.int32)
+    y = np.array([np.iinfo(np.int32).min, 4], dtype=np.int32)
+    columns = ScanColumns.from_arrays(x, y, np.zeros(2, bool), np.zeros(2, bool), np.zeros(2, np.int32))
+
+    assert columns.squared_distance.min() == 25
+    assert DistanceFilter(100).mask(columns).tolist() == [False, True]
+
+
+def test_radar_system_vectorized_no_valid_targets():
+    radar_system = RadarSystem(['avoid-crossfire'], vectorized=True)
+    sd1 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='mech', number=1), allies=2)
+
+    with pytest.raises(ValueError, match='No valid targets found'):
+        radar_system.find_next_target([sd1])
+    with pytest.raises(ValueError, match='No valid targets found'):
+        radar_system.find_next_target([])
+
+
+@pytest.mark.parametrize('request_data,expected_coordinates', load_test_cases())
+def test_radar_system_vectorized_matches_test_cases(request_data: RadarRequest, expected_coordinates):
+    expected = RadarSystem(request_data.protocols).find_next_target(request_data.scan)
+    next_target = RadarSystem(request_data.protocols, vectorized=True).find_next_target(request_data.scan)
+
+    assert next_target is expected
+    assert next_target.coordinates.dict() == expected_coordinates
+
+
+# Test cases for ProtocolPlan and compile_protocols
+@pytest.mark.parametrize(
+    'protocols,expected',
+    [
+        ([], ()),
+        (['closest-enemies', 'avoid-crossfire', 'avoid-mech'], ('avoid-mech', 'avoid-crossfire', 'closest-enemies')),
+        (['avoid-mech', 'avoid-mech', 'unknown'], ('avoid-mech',)),
+        (['closest-enemies', 'assist-allies', 'closest-enemies'], ('assist-allies', 'closest-enemies')),
+    ],
+)
+def test_normalize_protocols(protocols, expected):
+    assert normalize_protocols(protocols) == expected
+
+
+def test_compile_protocols_reuses_cached_plans():
+    plan = compile_protocols(['avoid-crossfire', 'furthest-enemies', 'avoid-mech'])
+    hits = plan_cache_info().hits
+
+    assert compile_protocols(['avoid-mech', 'avoid-crossfire', 'furthest-enemies']) is plan
+    assert plan_cache_info().hits == hits + 1
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plan.protocols = ()
+
+
+def test_protocol_plan_keeps_stable_multi_pass_order():
+    protocols = ['closest-enemies', 'assist-allies']
+    sd1 = ScanData(coordinates=Coordinates(x=4, y=3), enemies=Enemies(type='soldier', number=1), allies=1)
+    sd2 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd3 = ScanData(coordinates=Coordinates(x=0, y=5), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd4 = ScanData(coordinates=Coordinates(x=1, y=1), enemies=Enemies(type='soldier', number=1), allies=None)
+    targets = [sd1, sd2, sd3, sd4]
+    plan = compile_protocols(protocols)
+
+    assert sorted(targets, key=plan.sort_key) == RadarSystem(protocols)._sort_targets(targets)
+    assert plan.find_next_target(targets) == sd2
+
+
+def test_protocol_plan_no_valid_targets():
+    sd1 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='mech', number=1), allies=2)
+
+    with pytest.raises(ValueError, match='No valid targets found'):
+        compile_protocols(['avoid-crossfire']).find_next_target([sd1])
+
+
+@pytest.mark.parametrize('request_data,expected_coordinates', load_test_cases())
+def test_protocol_plan_matches_test_cases(request_data: RadarRequest, expected_coordinates):
+    expected = RadarSystem(request_data.protocols).find_next_target(request_data.scan)
+    plan = compile_protocols(request_data.protocols)
+
+    assert plan.find_next_target(request_data.scan) is expected
+    assert plan.find_next_target(request_data.scan, vectorized=True) is expected
+
+
+# Test cases for top-k selection
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_radar_system_find_top_targets(vectorized):
+    protocols = ['closest-enemies', 'assist-allies']
+    sd1 = ScanData(coordinates=Coordinates(x=4, y=3), enemies=Enemies(type='soldier', number=1), allies=1)
+    sd2 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd3 = ScanData(coordinates=Coordinates(x=0, y=5), enemies=Enemies(type='soldier', number=1), allies=2)
+    sd4 = ScanData(coordinates=Coordinates(x=1, y=1), enemies=Enemies(type='soldier', number=1), allies=None)
+    sd5 = ScanData(coordinates=Coordinates(x=100, y=1), enemies=Enemies(type='soldier', number=1), allies=9)
+    targets = [sd1, sd2, sd3, sd4, sd5]
+    radar_system = RadarSystem(protocols, vectorized=vectorized)
+
+    assert radar_system.find_top_targets(targets, 3) == [sd2, sd3, sd1]
+    assert radar_system.find_top_targets(targets, 10) == [sd2, sd3, sd1, sd4]
+    assert compile_protocols(protocols).find_top_targets(targets, 3, vectorized=vectorized) == [sd2, sd3, sd1]
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_find_top_targets_without_sorting_methods(vectorized):
+    sd1 = ScanData(coordinates=Coordinates(x=3, y=4), enemies=Enemies(type='mech', number=1), allies=2)
+    sd2 = ScanData(coordinates=Coordinates(x=5, y=12), enemies=Enemies(type='infantry', number=1), allies=None)
+    sd3 = ScanData(coordinates=Coordinates(x=1, y=2), enemies=Enemies(type='infantry', number=1), allies=None)
+    plan = compile_protocols(['avoid-crossfire'])
+
+    assert plan.find_top_targets([sd1, sd2, sd3], 1, vectorized=vectorized) == [sd2]
+    assert plan.find_top_targets([sd1, sd2, sd3], 5, vectorized=vectorized) == [sd2, sd3]
+    assert plan.find_top_targets([sd1], 5, vectorized=vectorized) == []
+
+
+@pytest.mark.parametrize('request_data,expected_coordinates', load_test_cases())
+def test_find_top_targets_matches_full_sort(request_data: RadarRequest, expected_coordinates):
+    radar_system = RadarSystem(request_data.protocols)
+    expected = radar_system._sort_targets(radar_system._apply_filters(request_data.scan))
+
+    assert radar_system.find_top_targets(request_data.scan, 5) == expected[:5]
+    assert compile_protocols(request_data.protocols).find_top_targets(request_data.scan, 5) == expected[:5]
+
+
+# Test cases for the adaptive filter chain
+def test_filter_statistics_orders_cheap_selective_filters_first():
+    statistics = FilterStatistics(reorder_every=2)
+    filters = (DistanceFilter(100), CrossfireFilter(), MechFilter())
+
+    assert statistics.order(filters) == filters
+
+    statistics.record('DistanceFilter', 100, 1, 1e-3)
+    statistics.record('CrossfireFilter', 100, 50, 1e-3)
+    statistics.record('MechFilter', 100, 50, 1e-4)
+    statistics.sampled()
+    assert statistics.version == 0
+
+    statistics.sampled()
+    assert statistics.version == 1
+    assert statistics.order(filters) == (filters[2], filters[1], filters[0])
+
+    snapshot = statistics.snapshot()
+    assert snapshot['order'] == ['MechFilter', 'CrossfireFilter', 'DistanceFilter']
+    assert snapshot['filters']['MechFilter']['rejection_rate'] == 0.5
+    assert snapshot['filters']['MechFilter']['evaluated'] == 50
+
+
+def test_adaptive_filter_chain_keeps_results(monkeypatch):
+    monkeypatch.setattr(settings, 'adaptive_filter_sample_every', 1)
+    monkeypatch.setattr(filter_statistics, 'reorder_every', 1)
+    filter_statistics.reset()
+    try:
+        for _ in range(3):
+            for request_data, expected_coordinates in load_test_cases():
+                target = compile_protocols(request_data.protocols).find_next_target(request_data.scan)
+                assert target.coordinates.dict() == expected_coordinates
+        assert filter_statistics.snapshot()['order']
+    finally:
+        filter_statistics.reset()
@@ -0,0 +1,148 @@
+import itertools
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas import Coordinates, Enemies, SessionDelta, SessionPoint
+from app.services import RadarSystem, compile_protocols
+from app.sessions import (
+    BattlefieldSession,
+    SessionDeltaError,
+    SessionNotFoundError,
+    SessionStore,
+)
+
+client = TestClient(app)
+
+PROTOCOLS = ['avoid-mech', 'prioritize-mech', 'avoid-crossfire', 'assist-allies', 'closest-enemies',
+             'furthest-enemies']
+
+
+def make_point(point_id, x, y, enemy_type='soldier', allies=None):
+    return SessionPoint(
+        id=point_id, coordinates=Coordinates(x=x, y=y), enemies=Enemies(type=enemy_type, number=1), allies=allies
+    )
+
+
+def random_point(rng, point_id):
+    return make_point(
+        point_id, rng.randint(-80, 80), rng.randint(-80, 80), rng.choice(['soldier', 'mech']),
+        rng.choice([None, 1, 2, 3]),
+    )
+
+
+def expected_next_target(protocols, scan):
+    try:
+        return RadarSystem(protocols).find_next_target(scan)
+    except ValueError:
+        return None
+
+
+def session_next_target(session, protocols):
+    try:
+        return session.find_next_target(compile_protocols(protocols))
+    except ValueError:
+        return None
+
+
+def test_session_apply_delta():
+    session = BattlefieldSession('session', max_points=10)
+    session.apply(SessionDelta(add=[make_point('a', 0, 10), make_point('b', 0, 20)]))
+    session.apply(SessionDelta(update=[make_point('a', 0, 30)], remove=['b'], add=[make_point('c', 0, 5)]))
+
+    assert len(session) == 2
+    assert session.find_next_target(compile_protocols(['furthest-enemies'])).coordinates == Coordinates(x=0, y=30)
+    assert session.find_next_target(compile_protocols(['closest-enemies'])).coordinates == Coordinates(x=0, y=5)
+    assert session.find_next_target(compile_protocols([])).coordinates == Coordinates(x=0, y=30)
+
+
+@pytest.mark.parametrize(
+    'delta',
+    [
+        SessionDelta(add=[make_point('a', 0, 1)]),
+        SessionDelta(add=[make_point('x', 0, 1), make_point('x', 0, 2)]),
+        SessionDelta(update=[make_point('x', 0, 1)]),
+        SessionDelta(remove=['x']),
+        SessionDelta(add=[make_point('x', 0, 1), make_point('y', 0, 2)]),
+        SessionDelta(update=[make_point('a', 0, 2)], remove=['a']),
+        SessionDelta(update=[make_point('a', 0, 2), make_point('a', 0, 3)]),
+    ],
+)
+def test_session_rejects_invalid_delta(delta):
+    session = BattlefieldSession('session', max_points=2)
+    session.apply(SessionDelta(add=[make_point('a', 0, 10)]))
+
+    with pytest.raises(SessionDeltaError):
+        session.apply(delta)
+    assert len(session) == 1
+    assert session.find_next_target(compile_protocols([])).coordinates == Coordinates(x=0, y=10)
+
+
+def test_session_matches_radar_system():
+    rng = random.Random(7)
+    session = BattlefieldSession('session', max_points=1000)
+    points = {}
+    protocol_lists = [list(combination) for size in range(4) for combination in itertools.permutations(PROTOCOLS, size)]
+
+    for tick in range(30):
+        added = [random_point(rng, f'{tick}-{position}') for position in range(rng.randint(0, 15))]
+        updated = [random_point(rng, point_id) for point_id in rng.sample(sorted(points), min(len(points), 3))]
+        removed = rng.sample(sorted(set(points) - {p.id for p in updated}), min(len(points) - len(updated), 3))
+        session.apply(SessionDelta(add=added, update=updated, remove=removed))
+        for point_id in removed:
+            del points[point_id]
+        points.update({point.id: point for point in updated + added})
+
+        scan = list(points.values())
+        for protocols in rng.sample(protocol_lists, 20):
+            assert session_next_target(session, protocols) == expected_next_target(protocols, scan), protocols
+
+
+def test_session_store_evicts_idle_and_least_recently_used_sessions():
+    now = [0.0]
+    store = SessionStore(max_sessions=2, max_points=10, idle_timeout=45, clock=lambda: now[0])
+    first = store.create()
+    second = store.create()
+    now[0] = 30
+    store.get(first.session_id)
+    now[0] = 40
+    third = store.create()
+
+    with pytest.raises(SessionNotFoundError):
+        store.get(second.session_id)
+
+    now[0] = 80
+    assert store.get(third.session_id) is third
+    with pytest.raises(SessionNotFoundError):
+        store.get(first.session_id)
+    assert len(store) == 1
+
+
+def test_session_endpoints():
+    response = client.post('/sessions')
+    assert response.status_code == 201
+    session_id = response.json()['session_id']
+
+    response = client.patch(f'/sessions/{session_id}/scan', json={'add': [
+        {'id': 'a', 'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}},
+        {'id': 'b', 'coordinates': {'x': 0, 'y': 80}, 'allies': 5, 'enemies': {'type': 'mech', 'number': 1}},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {'session_id': session_id, 'points': 2}
+
+    response = client.post(f'/sessions/{session_id}/radar', json={'protocols': ['prioritize-mech']})
+    assert response.status_code == 200
+    assert response.json() == {'x': 0, 'y': 80}
+
+    response = client.patch(f'/sessions/{session_id}/scan', json={'remove': ['b']})
+    assert response.json()['points'] == 1
+    response = client.post(f'/sessions/{session_id}/radar', json={'protocols': ['prioritize-mech']})
+    assert response.status_code == 404
+
+    response = client.patch(f'/sessions/{session_id}/scan', json={'remove': ['b']})
+    assert response.status_code == 422
+
+    assert client.delete(f'/sessions/{session_id}').status_code == 204
+    assert client.post(f'/sessions/{session_id}/radar', json={'protocols': []}).status_code == 404
@@ -0,0 +1,78 @@
+import pytest
+
+from app import sharding
+from app.batch import shutdown_process_pool
+from app.config import settings
+from app.schemas import ScanData
+from app.services import ColumnRangeError, RadarSystem, compile_protocols
+from benchmarks.scans import all_protocol_mixes, generate_scan
+
+# A small spread gives many points at the same distance, so ties must resolve like the stable sorts.
+SCAN = [ScanData.parse_obj(point) for point in generate_scan(3_000, mech_ratio=0.4, allies_ratio=0.4, spread=8, seed=5)]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def process_pool():
+    yield
+    shutdown_process_pool()
+
+
+@pytest.mark.parametrize('protocols', all_protocol_mixes()[::7])
+@pytest.mark.parametrize('k', [1, 5])
+def test_sharded_matches_sequential(protocols, k):
+    plan = compile_protocols(protocols)
+    expected = RadarSystem(protocols).find_top_targets(SCAN, k)
+
+    assert sharding.find_top_targets_sharded(plan, SCAN, k, shards=4) == expected
+
+
+def test_sharded_rejects_huge_coordinates():
+    plan = compile_protocols(['closest-enemies'])
+    far = [
+        ScanData(coordinates={'x': coordinate, 'y': 0}, enemies={'type': 'soldier', 'number': 1})
+        for coordinate in (2 ** 32, -2 ** 70)
+    ]
+
+    expected = RadarSystem(['closest-enemies']).find_top_targets(SCAN, 1)
+
+    assert sharding.find_top_targets_sharded(plan, far + SCAN, 1, shards=2) == expected
+
+
+def test_large_scans_with_huge_allies_are_ranked_in_python(monkeypatch):
+    monkeypatch.setattr(sharding, 'batch_workers', lambda: 2)
+    monkeypatch.setattr(settings, 'parallel_scan_threshold', len(SCAN))
+    huge = ScanData(coordinates={'x': 0, 'y': 1}, enemies={'type': 'soldier', 'number': 1}, allies=2 ** 63)
+    plan = compile_protocols(['assist-allies'])
+
+    with pytest.raises(ColumnRangeError):
+        sharding.find_top_targets_sharded(plan, SCAN + [huge], 1)
+    assert plan.find_next_target(SCAN + [huge]) == huge
+
+
+def test_sharded_without_candidates():
+    plan = compile_protocols(['avoid-mech', 'prioritize-mech'])
+
+    assert sharding.find_top_targets_sharded(plan, SCAN, 1, shards=3) == []
+
+
+def test_large_scans_are_sharded(monkeypatch):
+    calls = []
+    find_top_targets_sharded = sharding.find_top_targets_sharded
+
+    def spy(*args, **kwargs):
+        calls.append(args)
+        return find_top_targets_sharded(*args, **kwargs)
+
+    monkeypatch.setattr(sharding, 'find_top_targets_sharded', spy)
+    monkeypatch.setattr(sharding, 'batch_workers', lambda: 2)
+    plan = compile_protocols(['closest-enemies', 'assist-allies'])
+    expected = plan.find_next_target(SCAN)
+    assert not calls
+
+    monkeypatch.setattr(settings, 'parallel_scan_threshold', len(SCAN))
+    assert plan.find_next_target(SCAN) == expected
+    assert len(calls) == 1
+
+    monkeypatch.setattr(sharding, 'is_pool_worker', lambda: True)
+    assert plan.find_next_target(SCAN) == expected
+    assert len(calls) == 1
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import RadarSystem, TargetTracker, compile_protocols
+from app.streaming import iter_ndjson, track_stream
+from app.tests.cases import load_test_cases
+
+client = TestClient(app)
+
+
+async def as_chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def to_ndjson(protocols, scan) -> bytes:
+    lines = [json.dumps({'protocols': protocols})] + [json.dumps(point) for point in scan]
+    return '\n'.join(lines).encode()
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_iter_ndjson_splits_lines_across_chunks():
+    body = b'{"a": 1}\n\n[2, 3]\n"four"'
+
+    assert asyncio.run(collect(iter_ndjson(as_chunks(body, 3)))) == [(0, {'a': 1}), (2, [2, 3]), (3, 'four')]
+
+
+def test_iter_ndjson_invalid_line():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(collect(iter_ndjson(as_chunks(b'{"a": 1}\n{"a":', 4))))
+
+    assert error.value.status_code == 422
+    assert error.value.detail[0]['loc'] == ['body', 1]
+
+
+@pytest.mark.parametrize('body', [b'x' * 100, b'{"a": 1}\n' + b' ' * 100 + b'\n'])
+def test_iter_ndjson_rejects_long_lines(body):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(collect(iter_ndjson(as_chunks(body, 7), max_line_size=64)))
+
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize('request_data,expected_coordinates', load_test_cases())
+def test_track_stream_matches_test_cases(request_data, expected_coordinates):
+    scan = [point.dict(exclude_none=True) for point in request_data.scan]
+    body = to_ndjson([protocol.value for protocol in request_data.protocols], scan)
+    radar_system = RadarSystem(request_data.protocols)
+
+    assert asyncio.run(track_stream(as_chunks(body, 64), 3)) == radar_system.find_top_targets(request_data.scan, 3)
+    assert asyncio.run(track_stream(as_chunks(body, 64)))[0].coordinates.dict() == expected_coordinates
+
+
+def test_target_tracker_keeps_only_k_targets():
+    request_data, _ = load_test_cases()[-1]
+    tracker = TargetTracker(compile_protocols(request_data.protocols), 2)
+    for target in request_data.scan:
+        tracker.push(target)
+
+    assert tracker.count == len(request_data.scan)
+    assert len(tracker._heap) == 2
+    assert tracker.targets() == RadarSystem(request_data.protocols).find_top_targets(request_data.scan, 2)
+
+
+def test_radar_stream_endpoint():
+    body = to_ndjson(['closest-enemies', 'avoid-mech'], [
+        {'coordinates': {'x': 0, 'y': 1}, 'enemies': {'type': 'mech', 'number': 1}},
+        {'coordinates': {'x': 0, 'y': 10}, 'enemies': {'type': 'soldier', 'number': 10}},
+        {'coordinates': {'x': 0, 'y': 5}, 'enemies': {'type': 'soldier', 'number': 1}},
+    ])
+    response = client.post('/radar/stream', params={'k': 2}, content=body,
+                           headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.json() == [{'x': 0, 'y': 5}, {'x': 0, 'y': 10}]
+
+
+@pytest.mark.parametrize(
+    'body,loc',
+    [
+        (b'', ['body', 0, 'protocols']),
+        (b'{"protocols": ["unknown"]}', ['body', 0, 'protocols', 0]),
+        (b'{"protocols": []}\n{"coordinates": {"x": 0}, "enemies": {"type": "mech", "number": 1}}', ['body', 1, 'coordinates', 'y']),  # noqa: E501
+    ],
+)
+def test_radar_stream_endpoint_validation_error(body, loc):
+    response = client.post('/radar/stream', content=body, headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == loc
+
+
+def test_radar_stream_endpoint_limits(monkeypatch):
+    point = {'coordinates': {'x': 0, 'y': 5}, 'enemies': {'type': 'soldier', 'number': 1}}
+    monkeypatch.setattr(settings, 'max_scan_size', 2)
+    monkeypatch.setattr(settings, 'max_stream_line_size', 128)
+
+    def post(body: bytes):
+        return client.post('/radar/stream', content=body, headers={'Content-Type': 'application/x-ndjson'})
+
+    assert post(to_ndjson(['closest-enemies'], [point] * 2)).status_code == 200
+    assert post(to_ndjson(['closest-enemies'], [point] * 3)).status_code == 413
+    assert post(b'{"protocols": []}\n' + b'[' * 1_000).status_code == 413
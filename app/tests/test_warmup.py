@@ -0,0 +1,52 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import normalize_protocols, plan_cache_info
+from app.warmup import asgi_request, normalized_protocol_lists, prebuild_plans, warm_up
+from benchmarks.scans import all_protocol_mixes
+
+
+def test_normalized_protocol_lists_cover_every_mix():
+    protocol_lists = normalized_protocol_lists()
+
+    assert len(protocol_lists) == len(set(protocol_lists)) == 128
+    assert set(protocol_lists) == {normalize_protocols(protocols) for protocols in all_protocol_mixes()}
+    assert all(normalize_protocols(protocols) == protocols for protocols in protocol_lists)
+
+
+def test_prebuild_plans_fills_the_plan_cache():
+    assert prebuild_plans() == 128
+    hits = plan_cache_info().hits
+
+    assert prebuild_plans() == 128
+    assert plan_cache_info().hits == hits + 128
+
+
+def test_asgi_request():
+    status, body = asyncio.run(asgi_request(
+        app, 'POST', '/radar', b'{"protocols":[],"scan":[{"coordinates":{"x":3,"y":4},"enemies":{"type":"mech",'
+                               b'"number":1}}]}', {'Content-Type': 'application/json'},
+    ))
+    assert (status, body) == (200, b'{"x":3,"y":4}')
+
+    status, body = asyncio.run(asgi_request(app, 'POST', '/radar', b'{}', {'Content-Type': 'application/json'}))
+    assert status == 422
+
+
+def test_warm_up():
+    asyncio.run(warm_up(app))
+
+
+def test_ready(monkeypatch):
+    monkeypatch.setattr(app.state, 'ready', False)
+    client = TestClient(app)
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json() == {'ready': False}
+
+    with client:
+        response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.json() == {'ready': True}
@@ -0,0 +1,106 @@
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Message
+
+from app.packed import PACKED_SCAN_MEDIA_TYPE, encode_packed_scan
+from app.schemas import ScanData
+from app.services import PROTOCOL_CLASSES, Filter, SortingMethod, compile_protocols
+
+WARMUP_SCAN = [
+    {'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}},
+    {'coordinates': {'x': 0, 'y': 80}, 'enemies': {'type': 'mech', 'number': 1}, 'allies': 5},
+    {'coordinates': {'x': 30, 'y': 20}, 'enemies': {'type': 'mech', 'number': 2}},
+    {'coordinates': {'x': 150, 'y': 150}, 'enemies': {'type': 'soldier', 'number': 20}, 'allies': 3},
+]
+
+
+def normalized_protocol_lists() -> List[Tuple[str, ...]]:
+    """Returns every distinct protocol list, in the canonical form of normalize_protocols."""
+    filters = [name for name, protocol_class in PROTOCOL_CLASSES.items() if issubclass(protocol_class, Filter)]
+    sorts = [name for name, protocol_class in PROTOCOL_CLASSES.items() if issubclass(protocol_class, SortingMethod)]
+    filter_sets = [
+        combination for size in range(len(filters) + 1) for combination in itertools.combinations(filters, size)
+    ]
+    sort_orders = [
+        permutation for size in range(len(sorts) + 1) for permutation in itertools.permutations(sorts, size)
+    ]
+    return [filter_set + sort_order for filter_set in filter_sets for sort_order in sort_orders]
+
+
+def prebuild_plans() -> int:
+    """
+    Compiles the plan of every distinct protocol list into the plan cache, so no
+    request pays for compiling one.
+
+    Returns:
+        int: The number of plans built.
+    """
+    protocol_lists = normalized_protocol_lists()
+    for protocols in protocol_lists:
+        compile_protocols(protocols)
+    return len(protocol_lists)
+
+
+async def asgi_request(
+    app: ASGIApp, method: str, path: str, body: bytes = b'', headers: Optional[Dict[str, str]] = None
+) -> Tuple[int, bytes]:
+    """
+    Sends one request to an ASGI app in-process, without a server or an HTTP client.
+
+    Returns:
+        Tuple[int, bytes]: The status code and the body of the response.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        + [(b'content-length', str(len(body)).encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = 0
+    chunks = []
+
+    async def receive() -> Message:
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return status, b''.join(chunks)
+
+
+async def warm_up(app: ASGIApp) -> None:
+    """
+    Sends synthetic /radar requests, in JSON and in the packed scan format,
+    through the whole app, so routing, validation, evaluation and serialization
+    have all run once before the worker reports ready.
+
+    Raises:
+        RuntimeError: If a warm-up request fails.
+    """
+    json_body = orjson.dumps({'protocols': ['avoid-mech', 'closest-enemies'], 'scan': WARMUP_SCAN})
+    packed_body = encode_packed_scan(['assist-allies'], [ScanData.parse_obj(point) for point in WARMUP_SCAN])
+    requests = [
+        (json_body, {'Content-Type': 'application/json'}),
+        (packed_body, {'Content-Type': PACKED_SCAN_MEDIA_TYPE}),
+    ]
+    for body, headers in requests:
+        status, content = await asgi_request(app, 'POST', '/radar', body, headers)
+        if status != 200:
+            raise RuntimeError(f'Warm-up request failed with {status}: {content!r}')
@@ -0,0 +1,180 @@
+"""
+Load generator for the /radar endpoint.
+
+Replays test_cases.txt, optionally mixed with synthetic scans, against the app
+in-process over ASGI or against a running server, checking every response
+against its expected answer.
+
+Usage:
+    python -m benchmarks.load --concurrency 32 --duration 10
+    python -m benchmarks.load --url http://localhost:8888 --rate 500 --synthetic-sizes 100 10000
+
+With --rate, requests are sent on a fixed schedule and latency is measured from
+the scheduled send time, so a stalled server is not hidden by the load
+generator waiting for it (coordinated omission).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import httpx
+
+from app.main import app
+from app.schemas import ScanData
+from app.services import RadarSystem
+from app.tests.cases import read_test_cases
+from benchmarks.scans import BASIC_PROTOCOL_MIXES, generate_request
+
+
+class LoadCase(NamedTuple):
+    body: bytes
+    expected: Optional[bytes]  # None when the request has no valid targets
+
+
+class LoadResult(NamedTuple):
+    latency: float
+    ok: bool
+
+
+def recorded_cases() -> List[LoadCase]:
+    """Builds one case per line of test_cases.txt, with its recorded answer."""
+    return [LoadCase(body.encode(), expected.encode()) for body, expected in read_test_cases()]
+
+
+def synthetic_cases(sizes: List[int], seed: int = 0) -> List[LoadCase]:
+    """Builds one case per size and protocol mix, with the answer computed by RadarSystem."""
+    cases = []
+    for size in sizes:
+        for position, protocols in enumerate(BASIC_PROTOCOL_MIXES):
+            request = generate_request(size, protocols, seed=seed + position)
+            try:
+                target = RadarSystem(protocols).find_next_target([ScanData.parse_obj(p) for p in request['scan']])
+                expected = json.dumps(target.coordinates.dict(), separators=(',', ':')).encode()
+            except ValueError:
+                expected = None
+            cases.append(LoadCase(json.dumps(request).encode(), expected))
+    return cases
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(round(fraction * len(sorted_values), 9))))
+    return sorted_values[rank - 1]
+
+
+def summarize(results: List[LoadResult], elapsed: float) -> Dict:
+    latencies = sorted(result.latency for result in results)
+    return {
+        'requests': len(results),
+        'failures': sum(not result.ok for result in results),
+        'elapsed': elapsed,
+        'requests_per_second': len(results) / elapsed if elapsed else 0.0,
+        'latency': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    cases: List[LoadCase],
+    concurrency: int = 16,
+    duration: float = 10.0,
+    rate: Optional[float] = None,
+    max_requests: Optional[int] = None,
+) -> Dict:
+    """
+    Sends the cases round-robin to POST /radar from `concurrency` workers until
+    `duration` seconds have passed or `max_requests` requests were sent.
+
+    Args:
+        client (httpx.AsyncClient): The client bound to the server or ASGI app.
+        cases (List[LoadCase]): The requests to replay and their expected answers.
+        concurrency (int): The number of requests in flight at most.
+        duration (float): The maximum duration of the run, in seconds.
+        rate (Optional[float]): The target requests per second; as fast as possible if None.
+        max_requests (Optional[int]): The maximum number of requests to send.
+
+    Returns:
+        Dict: The request count, failures, throughput and latency percentiles, in seconds.
+    """
+    results: List[LoadResult] = []
+    counter = iter(range(max_requests)) if max_requests is not None else itertools.count()
+    headers = {'Content-Type': 'application/json'}
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker() -> None:
+        for sequence in counter:
+            scheduled = start + sequence / rate if rate else time.perf_counter()
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            case = cases[sequence % len(cases)]
+            try:
+                response = await client.post('/radar', content=case.body, headers=headers)
+                ok = response.content == case.expected if case.expected is not None else response.status_code != 200
+            except httpx.HTTPError:
+                ok = False
+            results.append(LoadResult(time.perf_counter() - scheduled, ok))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(results, time.perf_counter() - start)
+
+
+def _client(url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=None)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url='http://radar')
+
+
+async def _main(args: argparse.Namespace) -> Dict:
+    cases = [] if args.no_test_cases else recorded_cases()
+    cases += synthetic_cases(args.synthetic_sizes, seed=args.seed)
+    if not cases:
+        raise SystemExit('No cases to send')
+    async with _client(args.url) as client:
+        return await run_load(client, cases, args.concurrency, args.duration, args.rate, args.requests)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description=__doc__.split('\n')[1])
+    parser.add_argument('--url', help='server to load, e.g. http://localhost:8888; in-process ASGI if omitted')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--rate', type=float, help='requests per second; as fast as possible if omitted')
+    parser.add_argument('--requests', type=int, help='stop after this many requests')
+    parser.add_argument('--synthetic-sizes', type=int, nargs='*', default=[], help='add synthetic scans of these sizes')
+    parser.add_argument('--no-test-cases', action='store_true', help='do not replay test_cases.txt')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(_main(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        latency = summary['latency']
+        print(f"{summary['requests']} requests, {summary['failures']} failures in {summary['elapsed']:.2f}s "
+              f"({summary['requests_per_second']:.1f} req/s)")
+        print(f"latency p50={latency['p50'] * 1e3:.2f}ms p95={latency['p95'] * 1e3:.2f}ms "
+              f"p99={latency['p99'] * 1e3:.2f}ms max={latency['max'] * 1e3:.2f}ms")
+    return 1 if summary['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
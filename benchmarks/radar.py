@@ -0,0 +1,271 @@
+"""
+Benchmarks for RadarSystem and the /radar endpoint.
+
+Usage:
+    python -m benchmarks.radar run --sizes 10 1000 100000 --output results.json
+    python -m benchmarks.radar run --baseline baseline.json --threshold 0.2
+    python -m benchmarks.radar compare baseline.json results.json --threshold 0.2
+
+`compare`, and `run` with --baseline, exit with status 1 when the median of any
+benchmark is slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, TextIO
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.schemas import ScanData
+from app.services import RadarSystem
+from benchmarks.scans import BASIC_PROTOCOL_MIXES, all_protocol_mixes, generate_scan
+
+DEFAULT_SIZES = [10, 1000, 100_000]
+
+
+def measure(func: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Dict:
+    """
+    Times func like timeit: calls are grouped in loops of at least min_time seconds
+    and the loop is repeated `repeat` times.
+
+    Returns:
+        Dict: The per-call min, median and mean times in seconds, and the loop size.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def benchmark_key(result: Dict) -> str:
+    return f"{result['name']}|{result['size']}|{','.join(result['protocols'])}"
+
+
+def _run_radar_system(scan, protocols: List[str], size: int, vectorized: bool, repeat: int) -> List[Dict]:
+    radar_system = RadarSystem(protocols, vectorized=vectorized)
+    filtered_targets = radar_system._apply_filters(scan)
+
+    def find_next_target():
+        try:
+            radar_system.find_next_target(scan)
+        except ValueError:
+            pass
+
+    stages = {
+        'RadarSystem.__init__': lambda: RadarSystem(protocols, vectorized=vectorized),
+        'RadarSystem._apply_filters': lambda: radar_system._apply_filters(scan),
+        'RadarSystem._sort_targets': lambda: radar_system._sort_targets(filtered_targets),
+        'RadarSystem.find_next_target': find_next_target,
+    }
+    return [
+        {'name': name, 'size': size, 'protocols': protocols, **measure(func, repeat=repeat)}
+        for name, func in stages.items()
+    ]
+
+
+def _run_endpoint(client, raw_scan, scan, protocols: List[str], size: int, repeat: int) -> Dict:
+    body = json.dumps({'protocols': protocols, 'scan': raw_scan}).encode()
+    headers = {'Content-Type': 'application/json'}
+
+    # A request without valid targets is answered with a 500; any other status means
+    # the benchmark would time rejections or crashes instead of the radar.
+    expected_status = 200 if RadarSystem(protocols).find_top_targets(scan, 1) else 500
+    response = client.post('/radar', content=body, headers=headers)
+    if response.status_code != expected_status:
+        raise RuntimeError(
+            f'POST /radar with {size} points and protocols {protocols} answered {response.status_code} '
+            f'instead of {expected_status}: {response.text[:200]}'
+        )
+    return {
+        'name': 'POST /radar',
+        'size': size,
+        'protocols': protocols,
+        **measure(lambda: client.post('/radar', content=body, headers=headers), repeat=repeat),
+    }
+
+
+@contextmanager
+def _request_limits(max_scan_size: int) -> Iterator[None]:
+    """Raises the body and scan size limits of the app for the scans of the run, restoring them afterwards."""
+    limits = {'max_body_size': settings.max_body_size, 'max_scan_size': settings.max_scan_size}
+    # A JSON point takes less than 128 bytes.
+    settings.max_body_size = max(settings.max_body_size, 128 * max_scan_size + 1024)
+    settings.max_scan_size = max(settings.max_scan_size, max_scan_size)
+    try:
+        yield
+    finally:
+        for name, value in limits.items():
+            setattr(settings, name, value)
+
+
+def run(
+    sizes: List[int],
+    protocol_mixes: List[List[str]],
+    repeat: int = 5,
+    endpoint: bool = True,
+    vectorized: bool = False,
+    mech_ratio: float = 0.2,
+    allies_ratio: float = 0.3,
+    spread: int = 150,
+    seed: int = 0,
+    log: Callable[[str], None] = lambda message: None,
+) -> Dict:
+    """
+    Runs every benchmark for every scan size and protocol mix.
+
+    Returns:
+        Dict: The run metadata and the list of results, ready to be dumped as JSON.
+    """
+    client = TestClient(app, raise_server_exceptions=False)
+    results = []
+    with _request_limits(max(sizes, default=0)):
+        for size in sizes:
+            raw_scan = generate_scan(size, mech_ratio=mech_ratio, allies_ratio=allies_ratio, spread=spread, seed=seed)
+            scan = [ScanData.parse_obj(point) for point in raw_scan]
+            for protocols in protocol_mixes:
+                log(f'size={size} protocols={protocols}')
+                results.extend(_run_radar_system(scan, protocols, size, vectorized, repeat))
+                if endpoint:
+                    results.append(_run_endpoint(client, raw_scan, scan, protocols, size, repeat))
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'vectorized': vectorized,
+            'mech_ratio': mech_ratio,
+            'allies_ratio': allies_ratio,
+            'spread': spread,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """
+    Compares the medians of two runs.
+
+    Args:
+        baseline (Dict): The saved reference run.
+        current (Dict): The run to check.
+        threshold (float): The allowed slowdown, as a fraction of the baseline median.
+
+    Returns:
+        List[Dict]: One entry per benchmark present in both runs, with its ratio and
+            whether it regressed.
+    """
+    baseline_results = {benchmark_key(result): result for result in baseline['results']}
+    comparison = []
+    for result in current['results']:
+        reference = baseline_results.get(benchmark_key(result))
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median'] if reference['median'] else 1.0
+        comparison.append({
+            'key': benchmark_key(result),
+            'baseline': reference['median'],
+            'current': result['median'],
+            'ratio': ratio,
+            'regressed': ratio > 1 + threshold,
+        })
+    return comparison
+
+
+def _report(comparison: List[Dict], stream: TextIO = sys.stdout) -> int:
+    regressions = [entry for entry in comparison if entry['regressed']]
+    for entry in comparison:
+        status = 'REGRESSED' if entry['regressed'] else 'ok'
+        print(f"{status:>9}  {entry['ratio']:6.2f}x  {entry['current'] * 1e6:12.1f}us  {entry['key']}", file=stream)
+    print(f'{len(regressions)} regression(s) in {len(comparison)} benchmark(s)', file=stream)
+    return 1 if regressions else 0
+
+
+def _load(path: str) -> Dict:
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.radar', description=__doc__.split('\n')[1])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    run_parser.add_argument('--all-combinations', action='store_true',
+                            help='benchmark every protocol combination instead of a representative set')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--no-endpoint', action='store_true', help='skip the ASGI request benchmarks')
+    run_parser.add_argument('--vectorized', action='store_true', help='use the NumPy engine')
+    run_parser.add_argument('--mech-ratio', type=float, default=0.2)
+    run_parser.add_argument('--allies-ratio', type=float, default=0.3)
+    run_parser.add_argument('--spread', type=int, default=150)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='write the results to this JSON file instead of stdout')
+    run_parser.add_argument('--baseline', help='compare the results against this JSON file')
+    run_parser.add_argument('--threshold', type=float, default=0.2)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        return _report(compare(_load(args.baseline), _load(args.current), args.threshold))
+
+    results = run(
+        sizes=args.sizes,
+        protocol_mixes=all_protocol_mixes() if args.all_combinations else BASIC_PROTOCOL_MIXES,
+        repeat=args.repeat,
+        endpoint=not args.no_endpoint,
+        vectorized=args.vectorized,
+        mech_ratio=args.mech_ratio,
+        allies_ratio=args.allies_ratio,
+        spread=args.spread,
+        seed=args.seed,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        return _report(compare(_load(args.baseline), results, args.threshold), stream=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
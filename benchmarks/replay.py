@@ -0,0 +1,166 @@
+"""
+Replays a capture log of /radar requests against an engine, offline.
+
+Usage:
+    python -m benchmarks.replay capture.log.gz --engine vectorized
+    python -m benchmarks.replay capture.log.gz --engine python --repeat 5 --slowest 20
+    python -m benchmarks.replay capture.log.gz --engine auto
+
+Every record is evaluated with the chosen engine, its answer is checked against
+the recorded result and its latency is reported next to the recorded one. Exits
+with status 1 when any answer differs. Records of requests that crashed are
+listed as errors instead of being replayed. The auto engine calibrates the engine
+dispatcher first and lets it pick a strategy per record, like the service does.
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.calibration import calibrate_engines
+from app.capture import NO_TARGET_ERROR, read_capture_log
+from app.schemas import RadarRequest, ScanData
+from app.services import RadarSystem, compile_protocols
+from app.sharding import find_top_targets_sharded
+from benchmarks.load import percentile
+
+Engine = Callable[[List[str], List[ScanData]], Optional[ScanData]]
+
+
+def _no_target(find_next_target: Callable[[], ScanData]) -> Optional[ScanData]:
+    try:
+        return find_next_target()
+    except ValueError:
+        return None
+
+
+def _sharded(protocols: List[str], scan: List[ScanData]) -> Optional[ScanData]:
+    targets = find_top_targets_sharded(compile_protocols(protocols), scan, 1)
+    return targets[0] if targets else None
+
+
+def _strategy(strategy: Optional[str]) -> Engine:
+    def engine(protocols: List[str], scan: List[ScanData]) -> Optional[ScanData]:
+        return _no_target(lambda: compile_protocols(protocols).find_next_target(scan, strategy=strategy))
+    return engine
+
+
+ENGINES: Dict[str, Engine] = {
+    'radar-system': lambda protocols, scan: _no_target(lambda: RadarSystem(protocols).find_next_target(scan)),
+    'auto': _strategy(None),
+    'python': _strategy('python'),
+    'vectorized': _strategy('vectorized'),
+    'sharded': _sharded,
+}
+
+
+def expected_answer(record: Dict) -> Tuple[bool, Optional[Dict]]:
+    """
+    Returns whether a record holds an answer, and that answer: coordinates, or
+    None when no target was valid. Records without a status predate it and always
+    hold an answer.
+    """
+    status = record.get('status')
+    if status is None or status == 200:
+        return True, record['result']
+    return status == 500 and record.get('error') == NO_TARGET_ERROR, None
+
+
+def replay(records: Iterable[Dict], engine: Engine, repeat: int = 1, slowest: int = 10) -> Dict:
+    """
+    Evaluates every record with the engine.
+
+    Args:
+        records (Iterable[Dict]): The records of a capture log.
+        engine (Engine): The engine to evaluate them with.
+        repeat (int): The number of evaluations per record; the fastest one is kept.
+        slowest (int): The number of slowest records to report.
+
+    Returns:
+        Dict: The replayed record count, the mismatching records, the records of
+            crashed requests, the replayed latency percentiles and the slowest
+            records with their recorded latency.
+    """
+    results = []
+    mismatches = []
+    errors = []
+    for position, record in enumerate(records):
+        answered, expected = expected_answer(record)
+        if not answered:
+            errors.append({'record': position, 'status': record.get('status'), 'error': record.get('error')})
+            continue
+        request = RadarRequest.parse_obj({'protocols': record['protocols'], 'scan': record['scan']})
+        protocols = [protocol.value for protocol in request.protocols]
+        latency = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            target = engine(protocols, request.scan)
+            latency = min(latency, time.perf_counter() - start)
+
+        answer = target.coordinates.dict() if target is not None else None
+        if answer != expected:
+            mismatches.append({'record': position, 'expected': expected, 'actual': answer})
+        results.append({
+            'record': position,
+            'size': len(request.scan),
+            'protocols': protocols,
+            'latency': latency,
+            'recorded_latency': record.get('latency'),
+        })
+
+    latencies = sorted(result['latency'] for result in results)
+    return {
+        'records': len(results),
+        'mismatches': mismatches,
+        'errors': errors,
+        'latency': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'slowest': sorted(results, key=lambda result: result['latency'], reverse=True)[:slowest],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.replay', description=__doc__.split('\n')[1])
+    parser.add_argument('log', help='capture log written with RADAR_CAPTURE_PATH')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='python')
+    parser.add_argument('--repeat', type=int, default=1, help='evaluations per record; the fastest is reported')
+    parser.add_argument('--slowest', type=int, default=10, help='number of slowest records to list')
+    parser.add_argument('--limit', type=int, help='replay only the first records')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    if args.engine == 'auto':
+        calibrate_engines()
+    records = read_capture_log(args.log)
+    if args.limit is not None:
+        records = itertools.islice(records, args.limit)
+    summary = replay(records, ENGINES[args.engine], repeat=args.repeat, slowest=args.slowest)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        latency = summary['latency']
+        print(f"{summary['records']} records, {len(summary['mismatches'])} mismatches with engine {args.engine}, "
+              f"{len(summary['errors'])} crashed requests skipped")
+        print(f"latency p50={latency['p50'] * 1e3:.2f}ms p95={latency['p95'] * 1e3:.2f}ms "
+              f"p99={latency['p99'] * 1e3:.2f}ms max={latency['max'] * 1e3:.2f}ms")
+        for result in summary['slowest']:
+            recorded = result['recorded_latency']
+            recorded_text = f'{recorded * 1e3:.2f}ms' if recorded is not None else '-'
+            print(f"  record {result['record']:>6}  {result['latency'] * 1e3:9.2f}ms  recorded {recorded_text:>10}  "
+                  f"size={result['size']}  protocols={','.join(result['protocols'])}")
+        for error in summary['errors']:
+            print(f"  ERROR record {error['record']}: status {error['status']}, {error['error']}")
+        for mismatch in summary['mismatches']:
+            print(f"  MISMATCH record {mismatch['record']}: expected {mismatch['expected']}, got {mismatch['actual']}")
+    return 1 if summary['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
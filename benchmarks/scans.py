@@ -0,0 +1,40 @@
+import itertools
+from typing import Dict, List
+
+from app.synthetic import generate_scan
+
+FILTER_PROTOCOLS = ['avoid-mech', 'prioritize-mech', 'avoid-crossfire']
+SORTING_PROTOCOLS = ['assist-allies', 'closest-enemies', 'furthest-enemies']
+
+BASIC_PROTOCOL_MIXES = [
+    [],
+    ['avoid-mech'],
+    ['prioritize-mech'],
+    ['avoid-crossfire'],
+    ['assist-allies'],
+    ['closest-enemies'],
+    ['furthest-enemies'],
+    ['closest-enemies', 'avoid-mech'],
+    ['furthest-enemies', 'avoid-crossfire'],
+    ['closest-enemies', 'prioritize-mech', 'avoid-crossfire'],
+    ['avoid-mech', 'assist-allies', 'closest-enemies'],
+    ['avoid-mech', 'avoid-crossfire', 'closest-enemies', 'assist-allies', 'furthest-enemies'],
+]
+
+
+def all_protocol_mixes() -> List[List[str]]:
+    """Returns every subset of filter protocols combined with every ordering of every subset of sorting protocols."""
+    filter_sets = [
+        list(combination) for size in range(len(FILTER_PROTOCOLS) + 1)
+        for combination in itertools.combinations(FILTER_PROTOCOLS, size)
+    ]
+    sort_sequences = [
+        list(permutation) for size in range(len(SORTING_PROTOCOLS) + 1)
+        for permutation in itertools.permutations(SORTING_PROTOCOLS, size)
+    ]
+    return [filters + sorts for filters in filter_sets for sorts in sort_sequences]
+
+
+def generate_request(size: int, protocols: List[str], **kwargs) -> Dict:
+    """Generates a synthetic RadarRequest body; keyword arguments are passed to generate_scan."""
+    return {'protocols': protocols, 'scan': generate_scan(size, **kwargs)}
@@ -0,0 +1,143 @@
+"""
+Cold start benchmark for radar workers.
+
+Starts fresh interpreters that import app.main, run the startup events and
+serve one /radar request in-process, and reports how long each step took.
+
+Usage:
+    python -m benchmarks.startup --repeat 10
+    python -m benchmarks.startup --production --budget 1.5
+
+With --budget, exits with status 1 when the median time from process start to
+the first /radar response is over the budget, in seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+FIRST_REQUEST = json.dumps({
+    'protocols': ['closest-enemies', 'avoid-mech'],
+    'scan': [
+        {'coordinates': {'x': 0, 'y': 40}, 'enemies': {'type': 'soldier', 'number': 10}},
+        {'coordinates': {'x': 0, 'y': 20}, 'enemies': {'type': 'mech', 'number': 1}, 'allies': 5},
+    ],
+}).encode()
+STAGES = ('interpreter', 'import', 'startup', 'first_response', 'total')
+
+
+def _child() -> None:
+    # Only the standard library is imported before this point, so the import
+    # stage covers everything the worker loads.
+    started_at = time.time()
+    start = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import asyncio
+
+    from app.warmup import asgi_request
+
+    async def serve_first_request() -> int:
+        await app.router.startup()
+        nonlocal ready
+        ready = time.perf_counter()
+        status, _ = await asgi_request(app, 'POST', '/radar', FIRST_REQUEST, {'Content-Type': 'application/json'})
+        return status
+
+    ready = imported
+    status = asyncio.run(serve_first_request())
+    done = time.perf_counter()
+    print(json.dumps({
+        'started_at': started_at,
+        'import': imported - start,
+        'startup': ready - imported,
+        'first_response': done - ready,
+        'since_start': done - start,
+        'status': status,
+    }))
+
+
+def measure_cold_start(production: bool = False) -> Dict:
+    """
+    Starts one worker process and times it up to its first /radar response.
+
+    Returns:
+        Dict: The seconds spent starting the interpreter, importing the app, running
+            the startup events, serving the first request, and in total.
+    """
+    env = {**os.environ, 'RADAR_PRODUCTION': 'true' if production else 'false'}
+    spawned_at = time.time()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child'], env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    child = json.loads(output.strip().splitlines()[-1])
+    if child['status'] != 200:
+        raise RuntimeError(f"First /radar request failed with {child['status']}")
+
+    interpreter = max(0.0, child['started_at'] - spawned_at)
+    return {
+        'interpreter': interpreter,
+        'import': child['import'],
+        'startup': child['startup'],
+        'first_response': child['first_response'],
+        'total': interpreter + child['since_start'],
+    }
+
+
+def run(repeat: int = 5, production: bool = False) -> Dict:
+    """
+    Measures `repeat` cold starts.
+
+    Returns:
+        Dict: The median, min and max of every stage, in seconds.
+    """
+    samples = [measure_cold_start(production) for _ in range(repeat)]
+    return {
+        'production': production,
+        'repeat': repeat,
+        'stages': {
+            stage: {
+                'median': statistics.median(sample[stage] for sample in samples),
+                'min': min(sample[stage] for sample in samples),
+                'max': max(sample[stage] for sample in samples),
+            }
+            for stage in STAGES
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--production', action='store_true', help='start the workers with RADAR_PRODUCTION=true')
+    parser.add_argument('--budget', type=float, help='maximum median seconds until the first /radar response')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child()
+        return 0
+
+    results = run(args.repeat, args.production)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for stage, timings in results['stages'].items():
+            print(f"{stage:>15}  median={timings['median'] * 1e3:8.1f}ms  "
+                  f"min={timings['min'] * 1e3:8.1f}ms  max={timings['max'] * 1e3:8.1f}ms")
+
+    if args.budget is not None and results['stages']['total']['median'] > args.budget:
+        print(f"Cold start over budget: {results['stages']['total']['median']:.3f}s > {args.budget:.3f}s",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())